@@ -48,6 +48,7 @@ MIDDLEWARE = [
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
+    'core.middleware.CSVUserMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
@@ -83,6 +84,62 @@ DATABASES = {
 }
 
 
+# CSV user management
+# Storage backend for core.csv_user_manager.CSVUserManager: 'csv', 'sqlite'
+# (data/users.sqlite3) or 'binary' (data/users.bin). A new SQLite or binary
+# store is seeded from data/users.csv on first use.
+
+USER_STORAGE_BACKEND = os.environ.get('USER_STORAGE_BACKEND', 'csv')
+
+# Durability of user storage writes: 'fsync', 'fdatasync' or 'none'
+USER_STORAGE_FSYNC = os.environ.get('USER_STORAGE_FSYNC', 'fsync')
+
+# Seconds a signup/profile write waits for concurrent writes to share its
+# storage write and backup (group commit); 0 still batches queued writes
+USER_GROUP_COMMIT_WINDOW = float(os.environ.get('USER_GROUP_COMMIT_WINDOW', '0'))
+
+# Route login/signup in core.urls_csv to the async views when served by ASGI
+USER_ASYNC_VIEWS = os.environ.get('USER_ASYNC_VIEWS', '').lower() in ('1', 'true', 'yes')
+
+# Cache (from CACHES) for read-through caching of CSVUserManager.get_user;
+# '' disables it. The views resolve request.csv_user from the resident table
+# and never call get_user, so it is off by default; enable it for other
+# get_user callers. Use a shared backend (memcached, redis, database) when
+# running several worker processes.
+USER_CACHE_ALIAS = os.environ.get('USER_CACHE_ALIAS', '')
+USER_CACHE_TIMEOUT = 300
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'csv-users',
+    }
+}
+
+# Hasher for new and upgraded passwords: 'pbkdf2_sha256' or 'scrypt'. Older
+# hashes keep working and are re-hashed on the user's next login.
+USER_PASSWORD_HASHER = os.environ.get('USER_PASSWORD_HASHER', 'pbkdf2_sha256')
+
+# Remember this many recent successful logins (for USER_AUTH_CACHE_TTL
+# seconds) so repeat logins skip the password hasher; 0 disables the cache.
+USER_AUTH_CACHE_SIZE = int(os.environ.get('USER_AUTH_CACHE_SIZE', '0'))
+USER_AUTH_CACHE_TTL = float(os.environ.get('USER_AUTH_CACHE_TTL', '300'))
+
+# Session storage: 'signed_cookies' keeps the session in a cookie signed with
+# SECRET_KEY, so logged-in pages need no session table read; 'cached_db'
+# serves sessions from CACHES and writes through to the database; 'db' is
+# Django's default. Each session stores a stamp of the user's password and
+# active state at login, and the views log it out once that stamp changes,
+# so a password change or deletion revokes cookie sessions too.
+USER_SESSION_ENGINE = os.environ.get('USER_SESSION_ENGINE', 'signed_cookies')
+SESSION_ENGINE = f'django.contrib.sessions.backends.{USER_SESSION_ENGINE}'
+SESSION_COOKIE_HTTPONLY = True
+
+# Manager that core.middleware.CSVUserMiddleware resolves request.csv_user
+# with; core.views and core.views_csv share core.user_manager.csv_manager
+USER_MANAGER = 'core.user_manager.csv_manager'
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark for CSV User Manager input validation
+Measures the per-record cost of _validate_input and validate_many.
+Usage: python benchmark_validation.py [record_count]
+"""
+
+import sys
+import timeit
+from pathlib import Path
+
+# Add the core directory to the Python path
+sys.path.append(str(Path(__file__).parent / 'core'))
+
+from csv_user_manager import CSVUserManager
+
+def make_records(count):
+    """Build a mix of valid records and records that fail validation."""
+    records = []
+    for i in range(count):
+        record = {
+            'username': f'doctor_{i}',
+            'email': f'doctor.{i}@hospital-{i % 50}.org',
+            'password': f'Secret{i}Pass',
+            'hospital_name': f'General Hospital {i % 50}',
+            'hospital_id': f'H{i % 977:04d}',
+            'license_id': f'LIC{i:07d}',
+        }
+        if i % 10 == 0:
+            record['hospital_name'] = '=HYPERLINK("http://example.com")'
+        records.append(record)
+    return records
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    manager = CSVUserManager.__new__(CSVUserManager)  # validation needs no storage
+    records = make_records(count)
+    valid = records[1]
+
+    print(f"Validating {count} records (10% invalid)")
+    print("=" * 50)
+
+    repeats = 5
+    single = min(timeit.repeat(lambda: manager._validate_input(valid), number=count, repeat=repeats))
+    print(f"_validate_input, valid record:  {single / count * 1e6:8.2f} µs/record")
+
+    batch = min(timeit.repeat(lambda: manager.validate_many(records), number=1, repeat=repeats))
+    print(f"validate_many, mixed batch:     {batch / count * 1e6:8.2f} µs/record")
+
+    failures = sum(1 for errors in manager.validate_many(records) if errors)
+    print(f"Records rejected: {failures}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Asyncio front end for the CSV User Management System.
+
+AsyncCSVUserManager wraps a CSVUserManager for ASGI deployments. Every
+call runs on a thread pool, so file I/O and password hashing never block
+the event loop, and concurrent identical reads share a single call.
+"""
+
+import asyncio
+import copy
+import functools
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+try:
+    from .csv_user_manager import CSVUserManager
+except ImportError:  # imported as a top-level module from the core directory
+    from csv_user_manager import CSVUserManager
+
+
+class AsyncCSVUserManager:
+    """
+    Awaitable versions of the CSVUserManager methods.
+
+    Reads (get_user, list_users, count_users, list_users_page and
+    search_users) are coalesced: while a read is running, callers on the
+    same event loop asking for the same thing wait for it instead of
+    starting another, and each gets its own copy of the result.
+    """
+
+    def __init__(self, manager: Optional[CSVUserManager] = None,
+                 executor: Optional[Executor] = None, **manager_options):
+        """
+        Initialize the async manager.
+
+        Args:
+            manager: CSVUserManager to wrap (built from manager_options if None)
+            executor: Executor for blocking calls (defaults to a thread pool)
+            **manager_options: CSVUserManager arguments when manager is None
+        """
+        self.manager = manager if manager is not None else CSVUserManager(**manager_options)
+        self.executor = executor or ThreadPoolExecutor(thread_name_prefix='csv-user-async')
+        self._inflight: Dict[tuple, asyncio.Future] = {}
+
+    async def _run(self, func: Callable, *args, **kwargs):
+        """Run a blocking manager call on the executor."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, functools.partial(func, *args, **kwargs))
+
+    async def _coalesced(self, func: Callable, *args, **kwargs):
+        """Run a read, sharing it with identical reads already in flight."""
+        loop = asyncio.get_running_loop()
+        key = (id(loop), func.__name__, args, tuple(sorted(kwargs.items())))
+        future = self._inflight.get(key)
+        if future is None:
+            future = asyncio.ensure_future(self._run(func, *args, **kwargs))
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        # Shield the shared call from one caller's cancellation
+        result = await asyncio.shield(future)
+        return copy.deepcopy(result)
+
+    async def authenticate_user(self, username: str, password: str) -> Dict:
+        """Awaitable CSVUserManager.authenticate_user."""
+        return await self._run(self.manager.authenticate_user, username, password)
+
+    async def create_user(self, user_data: Dict) -> Dict:
+        """Awaitable CSVUserManager.create_user."""
+        return await self._run(self.manager.create_user, user_data)
+
+    async def bulk_create_users(self, users, batch_size: int = 1000) -> Dict:
+        """Awaitable CSVUserManager.bulk_create_users."""
+        return await self._run(self.manager.bulk_create_users, users, batch_size)
+
+    async def update_user(self, user_id: str, update_data: Dict) -> Dict:
+        """Awaitable CSVUserManager.update_user."""
+        return await self._run(self.manager.update_user, user_id, update_data)
+
+    async def delete_user(self, user_id: str) -> Dict:
+        """Awaitable CSVUserManager.delete_user."""
+        return await self._run(self.manager.delete_user, user_id)
+
+    async def get_user(self, user_id: str = None, username: str = None) -> Dict:
+        """Awaitable, coalesced CSVUserManager.get_user."""
+        return await self._coalesced(self.manager.get_user, user_id, username)
+
+    async def list_users(self, active_only: bool = True) -> Dict:
+        """Awaitable, coalesced CSVUserManager.list_users."""
+        return await self._coalesced(self.manager.list_users, active_only)
+
+    async def count_users(self, active_only: bool = True) -> int:
+        """Awaitable, coalesced CSVUserManager.count_users."""
+        return await self._coalesced(self.manager.count_users, active_only)
+
+    async def search_users(self, query: str, limit: Optional[int] = None, offset: int = 0,
+                           mode: str = 'ranked', fields: Optional[List[str]] = None,
+                           active_only: bool = False) -> Dict:
+        """Awaitable, coalesced CSVUserManager.search_users."""
+        fields = tuple(fields) if fields else None
+        return await self._coalesced(self.manager.search_users, query, limit, offset,
+                                     mode, fields, active_only)
+
+    async def list_users_page(self, offset: int = 0, limit: Optional[int] = None,
+                              fields: Optional[List[str]] = None,
+                              active_only: bool = True) -> List[Dict]:
+        """Awaitable, coalesced page of CSVUserManager.iter_users."""
+        fields = tuple(fields) if fields else None
+        return await self._coalesced(self._users_page, offset, limit, fields, active_only)
+
+    def _users_page(self, offset, limit, fields, active_only) -> List[Dict]:
+        """Materialize one page of iter_users on the executor."""
+        return list(self.manager.iter_users(offset, limit, fields and list(fields), active_only))
@@ -3,64 +3,816 @@ CSV-based User Management System for Django
 This module provides secure CRUD operations for user data using CSV files.
 """
 
+import atexit
 import csv
+import functools
+import gzip
+import io
+import json
 import os
 import hashlib
+import heapq
+import hmac
+import itertools
 import secrets
 import threading
 import time
-import shutil
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Optional, Union
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Union
 from pathlib import Path
+from contextlib import contextmanager
 import re
 
+try:
+    from .user_storage import (
+        USER_FIELDS, UserRecord, UserStorage, create_storage,
+        read_user_records, write_user_records, _temp_path,
+    )
+    from .password_hashers import PasswordHasher, get_hasher, identify_hasher
+    from .user_search import UserSearchIndex, normalize_query, scan_users
+except ImportError:  # imported as a top-level module from the core directory
+    from user_storage import (
+        USER_FIELDS, UserRecord, UserStorage, create_storage,
+        read_user_records, write_user_records, _temp_path,
+    )
+    from password_hashers import PasswordHasher, get_hasher, identify_hasher
+    from user_search import UserSearchIndex, normalize_query, scan_users
+
+try:
+    import fcntl
+except ImportError:  # Windows: fall back to in-process locking only
+    fcntl = None
+
+# Fields that never leave the manager
+SENSITIVE_FIELDS = ('password_hash', 'salt')
+SAFE_FIELDS = tuple(f for f in USER_FIELDS if f not in SENSITIVE_FIELDS)
+
+# Input validation, compiled once
+_REQUIRED_FIELDS = ('username', 'email', 'password')
+_CREATE_FIELDS = ('username', 'email', 'password', 'hospital_name', 'hospital_id', 'license_id')
+_EMAIL_PATTERN = re.compile(r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$')
+_USERNAME_PATTERN = re.compile(r'^[a-zA-Z0-9_\s]+$')
+_DANGEROUS_CHARS = ('"', "'", '=', '+', '-', '\t', '\r', '\n')
+_EMAIL_DANGEROUS_CHARS = ('"', "'", '=', '+', '\t', '\r', '\n')
+_DANGEROUS_RE = re.compile('[' + re.escape(''.join(_DANGEROUS_CHARS)) + ']')
+_EMAIL_DANGEROUS_RE = re.compile('[' + re.escape(''.join(_EMAIL_DANGEROUS_CHARS)) + ']')
+
+# Data versions are unique to this process and to each table it loads
+_PROCESS_TAG = secrets.token_hex(4)
+_TABLE_GENERATIONS = itertools.count(1)
+
+
+class _ProcessLock:
+    """
+    Advisory reader/writer lock on a lock file, shared across processes.
+    
+    Uses flock(), so shared locks from several worker processes can be held
+    at once while an exclusive lock waits for all of them. On platforms
+    without fcntl the lock is a no-op and only the thread lock applies.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._fd = None
+    
+    def _fileno(self) -> int:
+        if self._fd is None:
+            self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        return self._fd
+    
+    def acquire(self, shared: bool = False):
+        if fcntl is not None:
+            fcntl.flock(self._fileno(), fcntl.LOCK_SH if shared else fcntl.LOCK_EX)
+    
+    def release(self):
+        if fcntl is not None and self._fd is not None:
+            fcntl.flock(self._fd, fcntl.LOCK_UN)
+    
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class _ReadWriteLock:
+    """
+    Writer-preferring readers/writer lock for threads in one process.
+    
+    Any number of readers may hold the lock together; a writer waits for
+    them to drain and blocks new readers while it is waiting.
+    """
+    
+    def __init__(self):
+        self._condition = threading.Condition(threading.Lock())
+        self._readers = 0
+        self._writer = False
+        self._waiting_writers = 0
+    
+    def acquire_read(self):
+        with self._condition:
+            while self._writer or self._waiting_writers:
+                self._condition.wait()
+            self._readers += 1
+    
+    def release_read(self):
+        with self._condition:
+            self._readers -= 1
+            if not self._readers:
+                self._condition.notify_all()
+    
+    def acquire_write(self):
+        with self._condition:
+            self._waiting_writers += 1
+            while self._writer or self._readers:
+                self._condition.wait()
+            self._waiting_writers -= 1
+            self._writer = True
+    
+    def release_write(self):
+        with self._condition:
+            self._writer = False
+            self._condition.notify_all()
+
+
+class _UserStats:
+    """
+    Aggregate counts over a table's rows, kept current in O(1) per change.
+    
+    Creation-date bounds only ever widen: created_at is set once when a
+    row is created, so a replaced row never moves them back.
+    """
+    
+    __slots__ = ('total', 'active', 'hospitals', 'first_created', 'last_created')
+    
+    def __init__(self):
+        self.total = 0
+        self.active = 0
+        self.hospitals: Dict[str, int] = {}
+        self.first_created = ''
+        self.last_created = ''
+    
+    def add(self, user: UserRecord):
+        """Count a row."""
+        self.total += 1
+        if user.is_active == 'true':
+            self.active += 1
+        if user.hospital_name:
+            self.hospitals[user.hospital_name] = self.hospitals.get(user.hospital_name, 0) + 1
+        if user.created_at:
+            if not self.first_created or user.created_at < self.first_created:
+                self.first_created = user.created_at
+            if user.created_at > self.last_created:
+                self.last_created = user.created_at
+    
+    def remove(self, user: UserRecord):
+        """Uncount a row that is being replaced."""
+        self.total -= 1
+        if user.is_active == 'true':
+            self.active -= 1
+        if user.hospital_name:
+            remaining = self.hospitals[user.hospital_name] - 1
+            if remaining:
+                self.hospitals[user.hospital_name] = remaining
+            else:
+                del self.hospitals[user.hospital_name]
+
+
+class _UserTable:
+    """
+    Resident user rows plus hash indexes mapping id/username/email to a
+    position in `users`. Rows are never removed, so positions are stable.
+    
+    A reload builds a new table and swaps it in whole, so a reader holding
+    a reference always sees rows and indexes that belong together. The
+    search index is built in the background after the first search and
+    then kept up to date by add() and replace(), which also bump `version`
+    and maintain `stats`.
+    """
+    
+    __slots__ = ('users', 'id_index', 'username_index', 'email_index', 'search',
+                 'stats', 'generation', 'version')
+    
+    def __init__(self, users: Optional[List[UserRecord]] = None):
+        self.generation = next(_TABLE_GENERATIONS)
+        self.version = 0
+        self.users = []
+        self.id_index: Dict[str, int] = {}
+        self.username_index: Dict[str, int] = {}
+        self.email_index: Dict[str, int] = {}
+        self.search: Optional[UserSearchIndex] = None
+        self.stats = _UserStats()
+        for user in users or ():
+            self.add(user)
+    
+    def add(self, user: UserRecord) -> int:
+        """Append a row and index it (the first row with a key wins)."""
+        position = len(self.users)
+        self.users.append(user)
+        self.version += 1
+        self.stats.add(user)
+        self.id_index.setdefault(user.id, position)
+        if user.username:
+            self.username_index.setdefault(user.username, position)
+        if user.email:
+            self.email_index.setdefault(user.email, position)
+        if self.search is not None:
+            self.search.add(position, user)
+        return position
+    
+    def replace(self, position: int, user: UserRecord):
+        """Swap in a new version of a row, re-indexing a changed email."""
+        previous = self.users[position]
+        self.users[position] = user
+        self.version += 1
+        self.stats.remove(previous)
+        self.stats.add(user)
+        if previous.email != user.email:
+            if self.email_index.get(previous.email) == position:
+                del self.email_index[previous.email]
+            if user.email:
+                self.email_index.setdefault(user.email, position)
+        if self.search is not None:
+            self.search.replace(position, user)
+    
+    def find(self, user_id: str = None, username: str = None) -> Optional[UserRecord]:
+        """Look up a row by ID or username, preferring the earlier row."""
+        positions = []
+        if user_id and user_id in self.id_index:
+            positions.append(self.id_index[user_id])
+        if username and username in self.username_index:
+            positions.append(self.username_index[username])
+        if not positions:
+            return None
+        return self.users[min(positions)]
+
+
+class _WriteBatch:
+    """
+    Table writes applied under one write lock and flushed to storage together.
+    
+    Rows at positions from `base` on were created in this batch; `updated`
+    holds the merged changes for each older row that was modified.
+    """
+    
+    __slots__ = ('base', 'updated', 'writes')
+    
+    def __init__(self, base: int):
+        self.base = base
+        self.updated: Dict[int, Dict] = {}
+        self.writes = 0
+
+
+class _CommitRequest:
+    """A queued table write waiting for a group commit."""
+    
+    __slots__ = ('operation', 'on_error', 'result', 'leader', 'done')
+    
+    def __init__(self, operation: Callable, on_error: Callable):
+        self.operation = operation
+        self.on_error = on_error
+        self.result = None
+        self.leader = False
+        self.done = threading.Event()
+
+
+class _CredentialCache:
+    """
+    Bounded LRU cache of recent successful password verifications.
+    
+    Entries are keyed by username and an HMAC of the presented password
+    under a per-process random key, so no password or reusable hash is
+    kept in memory. Each entry remembers the stored hash it was verified
+    against; a hit only counts while the user's current row still has that
+    hash and is active, so password changes and deletions made by any
+    process invalidate it even before invalidate() is called.
+    """
+    
+    def __init__(self, max_size: int, ttl: float):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._key = secrets.token_bytes(32)
+        self._entries: 'OrderedDict[tuple, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def _cache_key(self, username: str, password: str) -> tuple:
+        digest = hmac.new(self._key, password.encode(), hashlib.sha256).digest()
+        return (username, digest)
+    
+    def check(self, user: UserRecord, password: str) -> bool:
+        """Return True if this password was verified recently for this row."""
+        key = self._cache_key(user.username, password)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return False
+            expires_at, password_hash = entry
+            if expires_at < time.monotonic() or password_hash != user.password_hash:
+                del self._entries[key]
+                return False
+            self._entries.move_to_end(key)
+        return user.is_active == 'true'
+    
+    def add(self, user: UserRecord, password: str):
+        """Remember a successful verification against the user's stored hash."""
+        key = self._cache_key(user.username, password)
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, user.password_hash)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+    
+    def invalidate(self, username: str):
+        """Drop every cached verification for a user."""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == username]:
+                del self._entries[key]
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class UserBackupManager:
+    """
+    Content-addressed, compressed backup store for the user table.
+    
+    Snapshots are gzip-compressed and stored under objects/ by their SHA-256
+    digest, so identical snapshots are stored once. A manifest.jsonl file
+    records when each snapshot was taken. Backups are rate-limited by time
+    and write count and are taken on a background thread.
+    
+    Several managers (threads or worker processes) may share a backup
+    directory: the manifest is re-read and rewritten under a lock on
+    manifest.lock, so retention counts every process's backups and an
+    object is only removed once no manifest entry references it.
+    """
+    
+    def __init__(self, backup_dir: Union[str, Path], snapshot_source: Callable[[], bytes],
+                 min_interval: float = 60.0, every_n_writes: int = 100, keep: int = 10):
+        """
+        Initialize the backup manager.
+        
+        Args:
+            backup_dir: Directory for backup objects and the manifest
+            snapshot_source: Callable returning the current table as CSV bytes
+            min_interval: Seconds between backups while writes keep arriving
+            every_n_writes: Writes that force a backup before min_interval
+            keep: Number of manifest entries to retain
+        """
+        self.backup_dir = Path(backup_dir)
+        self.objects_dir = self.backup_dir / 'objects'
+        self.manifest_path = self.backup_dir / 'manifest.jsonl'
+        self.snapshot_source = snapshot_source
+        self.min_interval = min_interval
+        self.every_n_writes = every_n_writes
+        self.keep = keep
+        
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        
+        self._condition = threading.Condition()
+        self._pending_writes = 0
+        self._last_backup = None
+        self._requested = 0
+        self._completed = 0
+        self._worker = None
+        self._closed = False
+        
+        # Manifest changes: a thread lock within the process (flock does not
+        # exclude threads sharing a descriptor) and a file lock across them
+        self._manifest_mutex = threading.Lock()
+        self._manifest_lock = _ProcessLock(self.backup_dir / 'manifest.lock')
+    
+    @contextmanager
+    def _manifest_locked(self, shared: bool = False):
+        """Hold the manifest lock against other threads and processes."""
+        with self._manifest_mutex:
+            self._manifest_lock.acquire(shared=shared)
+            try:
+                yield
+            finally:
+                self._manifest_lock.release()
+    
+    def _load_manifest(self) -> List[Dict]:
+        """Read the manifest from disk; callers hold the manifest lock."""
+        entries = []
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as file:
+                for line in file:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        continue
+        except FileNotFoundError:
+            pass
+        return entries
+    
+    def _object_path(self, digest: str) -> Path:
+        return self.objects_dir / f"{digest}.csv.gz"
+    
+    def record_write(self, count: int = 1):
+        """Note table writes and wake the worker if a backup is due."""
+        with self._condition:
+            if self._closed:
+                return
+            self._pending_writes += count
+            due = (self._last_backup is None or
+                   self._pending_writes >= self.every_n_writes or
+                   time.monotonic() - self._last_backup >= self.min_interval)
+            if due:
+                self._requested += 1
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name='csv-user-backup', daemon=True
+                )
+                self._worker.start()
+                atexit.register(self.flush, 5.0)
+            self._condition.notify_all()
+    
+    def _run(self):
+        """Worker loop: take a backup when requested or when min_interval elapses."""
+        while True:
+            with self._condition:
+                while self._requested == self._completed:
+                    if self._closed:
+                        return
+                    if self._pending_writes and self._last_backup is not None:
+                        remaining = self.min_interval - (time.monotonic() - self._last_backup)
+                        if remaining <= 0:
+                            self._requested += 1
+                            break
+                        self._condition.wait(remaining)
+                    else:
+                        self._condition.wait()
+                target = self._requested
+                self._pending_writes = 0
+                self._last_backup = time.monotonic()
+            
+            try:
+                self.snapshot()
+            except Exception:
+                # A failed backup must never take down the request path;
+                # the next write schedules another attempt.
+                pass
+            
+            with self._condition:
+                self._completed = target
+                self._condition.notify_all()
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait until every requested backup has been written.
+        
+        Returns:
+            True if the worker caught up before the timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: self._completed >= self._requested, timeout
+            )
+    
+    def close(self, timeout: Optional[float] = None) -> bool:
+        """
+        Write any requested backups and stop the worker thread.
+        
+        Later writes no longer schedule backups; snapshot() still works.
+        
+        Returns:
+            True if the worker finished before the timeout
+        """
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+            worker = self._worker
+        if worker is not None:
+            worker.join(timeout)
+            if worker.is_alive():
+                return False
+        with self._manifest_mutex:
+            self._manifest_lock.close()
+        return True
+    
+    def snapshot(self) -> Dict:
+        """
+        Take a backup of the current table right away.
+        
+        Returns:
+            Manifest entry of the stored snapshot
+        """
+        data = self.snapshot_source()
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+        
+        entry = {
+            'timestamp': datetime.now().isoformat(),
+            'digest': digest,
+            'size': len(data),
+        }
+        
+        # The object is written under the lock too, so another process
+        # cannot prune it between the write and the manifest entry
+        with self._manifest_locked():
+            manifest = self._load_manifest()
+            if manifest and manifest[-1]['digest'] == digest and object_path.exists():
+                # Unchanged since the last backup: nothing new to record
+                return manifest[-1]
+            
+            if not object_path.exists():
+                temp_path = _temp_path(object_path)
+                with open(temp_path, 'wb') as raw:
+                    with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as file:
+                        file.write(data)
+                    raw.flush()
+                    os.fsync(raw.fileno())
+                os.replace(temp_path, object_path)
+            
+            manifest.append(entry)
+            if len(manifest) > self.keep:
+                self._prune(manifest)
+            else:
+                with open(self.manifest_path, 'a', encoding='utf-8') as file:
+                    file.write(json.dumps(entry) + '\n')
+        return entry
+    
+    def _prune(self, manifest: List[Dict]):
+        """Drop manifest entries beyond `keep` and their unreferenced objects."""
+        dropped = manifest[:-self.keep]
+        del manifest[:-self.keep]
+        
+        temp_path = _temp_path(self.manifest_path)
+        with open(temp_path, 'w', encoding='utf-8') as file:
+            for entry in manifest:
+                file.write(json.dumps(entry) + '\n')
+        os.replace(temp_path, self.manifest_path)
+        
+        referenced = {entry['digest'] for entry in manifest}
+        for entry in dropped:
+            if entry['digest'] not in referenced:
+                try:
+                    self._object_path(entry['digest']).unlink()
+                except FileNotFoundError:
+                    pass
+    
+    def list_backups(self) -> List[Dict]:
+        """Return manifest entries, newest first."""
+        with self._manifest_locked(shared=True):
+            return list(reversed(self._load_manifest()))
+    
+    def read_backup(self, digest: Optional[str] = None) -> bytes:
+        """
+        Return the CSV bytes of a backup, verifying its digest.
+        
+        Args:
+            digest: Snapshot digest (defaults to the newest backup)
+        """
+        if digest is None:
+            backups = self.list_backups()
+            if not backups:
+                raise FileNotFoundError('No backups available')
+            digest = backups[0]['digest']
+        
+        with gzip.open(self._object_path(digest), 'rb') as file:
+            data = file.read()
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f'Backup {digest} is corrupted')
+        return data
+    
+    def verify(self) -> Dict:
+        """
+        Check that every backup in the manifest decompresses to its digest.
+        
+        Returns:
+            Dictionary with verification result
+        """
+        errors = []
+        for entry in self.list_backups():
+            try:
+                self.read_backup(entry['digest'])
+            except Exception as e:
+                errors.append(f"{entry['digest']}: {str(e)}")
+        return {'success': not errors, 'errors': errors}
+
+
 class CSVUserManager:
     """
     A secure CSV-based user management system with file locking,
     password hashing, and data validation.
     """
     
-    def __init__(self, csv_file_path: str = 'users.csv', backup_dir: str = 'backups'):
+    def __init__(self, csv_file_path: str = 'users.csv', backup_dir: str = 'backups',
+                 compact_threshold: int = 1000, backup_interval: float = 60.0,
+                 backup_every: int = 100, backup_keep: int = 10,
+                 process_lock: bool = True, storage: Union[str, UserStorage] = 'csv',
+                 password_hasher: Union[str, PasswordHasher] = 'pbkdf2_sha256',
+                 verify_workers: Optional[int] = None,
+                 auth_cache_size: int = 0, auth_cache_ttl: float = 300.0,
+                 fsync: str = 'fsync', group_commit_window: float = 0.0,
+                 cache=None, cache_timeout: Optional[float] = 300, cache_prefix: str = 'csv_user'):
         """
         Initialize the CSV User Manager.
         
         Args:
             csv_file_path: Path to the CSV file
             backup_dir: Directory for backup files
+            compact_threshold: Journal records that trigger a background
+                compaction (0 disables automatic compaction)
+            backup_interval: Minimum seconds between background backups
+            backup_every: Writes that force a backup before backup_interval
+            backup_keep: Number of backups to retain
+            process_lock: Also take an OS-level lock file next to the store so
+                several worker processes can share it safely
+            storage: Storage backend name ('csv', 'sqlite' or 'binary') or a
+                UserStorage instance
+            password_hasher: Hasher for new passwords ('pbkdf2_sha256',
+                'scrypt' or 'sha256') or a PasswordHasher instance; hashes
+                made with any other hasher are upgraded on the next login
+            verify_workers: Threads that verify passwords (defaults to the
+                number of CPUs)
+            auth_cache_size: Recent successful logins to remember so repeat
+                logins skip the password hasher (0 disables the cache)
+            auth_cache_ttl: Seconds a remembered login stays valid
+            fsync: How storage writes are made durable: 'fsync', 'fdatasync'
+                or 'none' (ignored when storage is a UserStorage instance)
+            group_commit_window: Seconds a write waits for concurrent writes
+                to join its group commit (0 commits whatever is queued)
+            cache: Optional cache with get/set/add/incr/delete_many, e.g. a
+                Django cache backend, for read-through caching of get_user
+                results. With several worker processes use a shared backend,
+                since each process only invalidates the cache it writes to.
+            cache_timeout: Seconds a cached user stays valid (None for no expiry)
+            cache_prefix: Prefix for cache keys
         """
         self.csv_file_path = Path(csv_file_path)
         self.backup_dir = Path(backup_dir)
-        self.lock = threading.Lock()
+        self.compact_threshold = compact_threshold
+        self.lock = _ReadWriteLock()
+        self._flock_readers = 0
+        self._flock_mutex = threading.Lock()
         
         # Create necessary directories
         self.csv_file_path.parent.mkdir(parents=True, exist_ok=True)
         self.backup_dir.mkdir(parents=True, exist_ok=True)
         
         # CSV headers
-        self.headers = [
-            'id', 'username', 'email', 'password_hash', 'salt',
-            'hospital_name', 'hospital_id', 'license_id', 
-            'created_at', 'updated_at', 'is_active'
-        ]
+        self.headers = list(USER_FIELDS)
+        
+        if isinstance(storage, UserStorage):
+            self.storage = storage
+        else:
+            self.storage = create_storage(storage, self.csv_file_path, fsync)
+        
+        storage_path = self.storage.path
+        self.seq_file_path = storage_path.with_name(storage_path.name + '.seq')
+        self.lock_file_path = storage_path.with_name(storage_path.name + '.lock')
+        self._process_lock = _ProcessLock(self.lock_file_path) if process_lock else None
+        
+        # Resident user table with its hash indexes
+        self._table = _UserTable()
+        self._table_loaded = False
+        self._load_lock = threading.Lock()
+        
+        # Change listeners, replaced (never mutated) so notifying needs no lock
+        self._listeners: tuple = ()
+        self._listeners_lock = threading.Lock()
+        self._compaction_thread = None
         
-        # Initialize CSV file if it doesn't exist
-        self._initialize_csv()
+        # Background search index build for the current table, if any
+        self._search_lock = threading.Lock()
+        self._search_table = None
+        self._search_thread = None
+        self._next_id = 1
+        
+        # Group commit: concurrent writes queue up and one leader flushes them
+        self.group_commit_window = group_commit_window
+        self._commit_mutex = threading.Lock()
+        self._commit_queue: List[_CommitRequest] = []
+        self._committing = False
+        
+        # Password hashing runs outside the table lock on a bounded pool
+        self.hasher = get_hasher(password_hasher)
+        self._verify_pool = ThreadPoolExecutor(
+            max_workers=verify_workers or os.cpu_count() or 1,
+            thread_name_prefix='csv-user-verify'
+        )
+        self._auth_cache = (
+            _CredentialCache(auth_cache_size, auth_cache_ttl) if auth_cache_size > 0 else None
+        )
+        self._dummy_hash = None  # (hash, salt) checked for unknown users
+        
+        # Optional read-through cache of safe user dictionaries
+        self.cache = cache
+        self.cache_timeout = cache_timeout
+        self.cache_prefix = cache_prefix
+        self._cache_hits = 0
+        self._cache_misses = 0
+        self._stats_lock = threading.Lock()
+        
+        self.backups = UserBackupManager(
+            self.backup_dir, self._snapshot_bytes,
+            min_interval=backup_interval, every_n_writes=backup_every, keep=backup_keep
+        )
+        
+        # Initialize the storage file if it doesn't exist
+        self.storage.initialize()
     
-    def _initialize_csv(self):
-        """Initialize the CSV file with headers if it doesn't exist."""
-        if not self.csv_file_path.exists():
-            with open(self.csv_file_path, 'w', newline='', encoding='utf-8') as file:
-                writer = csv.DictWriter(file, fieldnames=self.headers)
-                writer.writeheader()
+    @contextmanager
+    def _locked(self, shared: bool = False):
+        """
+        Hold the readers/writer thread lock and, if enabled, the
+        cross-process file lock.
+        
+        Readers run concurrently: the first reader in the process takes the
+        shared file lock and the last one out releases it. Storage with
+        atomic reads needs no file lock for readers at all, so they never
+        wait on writers in other processes. Writers hold both locks
+        exclusively.
+        
+        Args:
+            shared: Take the lock for reading instead of writing
+        """
+        if shared:
+            self.lock.acquire_read()
+            try:
+                if self._process_lock is None or self.storage.atomic_reads:
+                    yield
+                    return
+                with self._flock_mutex:
+                    if not self._flock_readers:
+                        self._process_lock.acquire(shared=True)
+                    self._flock_readers += 1
+                try:
+                    yield
+                finally:
+                    with self._flock_mutex:
+                        self._flock_readers -= 1
+                        if not self._flock_readers:
+                            self._process_lock.release()
+            finally:
+                self.lock.release_read()
+        else:
+            self.lock.acquire_write()
+            try:
+                if self._process_lock is not None:
+                    self._process_lock.acquire()
+                try:
+                    yield
+                finally:
+                    if self._process_lock is not None:
+                        self._process_lock.release()
+            finally:
+                self.lock.release_write()
     
     def _generate_salt(self) -> str:
         """Generate a random salt for password hashing."""
         return secrets.token_hex(32)
     
     def _hash_password(self, password: str, salt: str) -> str:
-        """Hash a password with salt using SHA-256."""
-        return hashlib.sha256((password + salt).encode()).hexdigest()
+        """Hash a password with salt using the configured hasher."""
+        return self.hasher.encode(password, salt)
+    
+    def _check_password(self, user: UserRecord, password: str) -> bool:
+        """Verify a password against a user's stored hash."""
+        try:
+            hasher = identify_hasher(user.password_hash, self.hasher)
+        except ValueError:
+            return False
+        return hasher.verify(password, user.password_hash, user.salt)
+    
+    def _check_dummy_password(self, password: str) -> bool:
+        """Verify a password against a fixed hash, costing as much as a real check."""
+        if self._dummy_hash is None:
+            salt = self._generate_salt()
+            self._dummy_hash = (self._hash_password(secrets.token_hex(16), salt), salt)
+        password_hash, salt = self._dummy_hash
+        return self.hasher.verify(password, password_hash, salt)
+    
+    def _needs_rehash(self, user: UserRecord) -> bool:
+        """Return True if a stored hash uses another hasher or weaker parameters."""
+        hasher = identify_hasher(user.password_hash, self.hasher)
+        return hasher is not self.hasher or self.hasher.must_update(user.password_hash)
+    
+    def _rehash_password(self, user: UserRecord, password: str):
+        """Store a fresh hash for a user who just logged in with an old one."""
+        try:
+            salt = self._generate_salt()
+            password_hash = self._hash_password(password, salt)
+            self._commit(
+                functools.partial(self._apply_rehash, user, password_hash, salt),
+                lambda e: None
+            )
+        except Exception:
+            pass  # keep the old hash; the next login tries again
+    
+    def _apply_rehash(self, user: UserRecord, password_hash: str, salt: str,
+                      table: _UserTable, batch: _WriteBatch):
+        """Group-commit operation for _rehash_password."""
+        position = table.id_index.get(user.id)
+        
+        # Skip if the password changed while we were hashing
+        if position is None or table.users[position].password_hash != user.password_hash:
+            return None
+        self._replace_user(table, batch, position, {'password_hash': password_hash, 'salt': salt})
     
     def _validate_input(self, data: Dict) -> List[str]:
         """
@@ -72,81 +824,245 @@ class CSVUserManager:
         errors = []
         
         # Check for required fields
-        required_fields = ['username', 'email', 'password']
-        for field in required_fields:
+        for field in _REQUIRED_FIELDS:
             if not data.get(field):
                 errors.append(f"{field} is required")
         
         # Validate email format
         if data.get('email'):
-            email_pattern = r'^[a-zA-Z0-9._%+-]+@[a-zA-Z0-9.-]+\.[a-zA-Z]{2,}$'
-            if not re.match(email_pattern, data['email']):
+            if not _EMAIL_PATTERN.match(data['email']):
                 errors.append("Invalid email format")
         
-        # Check for CSV injection attempts (but allow @ in email)
-        dangerous_chars = ['"', "'", '=', '+', '-', '\t', '\r', '\n']
+        # Check for CSV injection attempts (but allow - in email)
         for key, value in data.items():
             if isinstance(value, str):
-                # Allow @ in email field, but check other dangerous characters
                 if key == 'email':
-                    # For email, only check for really dangerous characters
-                    email_dangerous_chars = ['"', "'", '=', '+', '\t', '\r', '\n']
-                    for char in email_dangerous_chars:
-                        if char in value:
-                            errors.append(f"Invalid character '{char}' in {key}")
+                    pattern, chars = _EMAIL_DANGEROUS_RE, _EMAIL_DANGEROUS_CHARS
                 else:
-                    # For other fields, check all dangerous characters
-                    for char in dangerous_chars:
-                        if char in value:
-                            errors.append(f"Invalid character '{char}' in {key}")
+                    pattern, chars = _DANGEROUS_RE, _DANGEROUS_CHARS
+                
+                # One scan per field; messages are only built for bad input
+                if pattern.search(value) is not None:
+                    found = set(pattern.findall(value))
+                    errors.extend(f"Invalid character '{char}' in {key}"
+                                  for char in chars if char in found)
         
         # Validate username (allow letters, numbers, underscore, and spaces)
         if data.get('username'):
-            if not re.match(r'^[a-zA-Z0-9_\s]+$', data['username']):
+            if not _USERNAME_PATTERN.match(data['username']):
                 errors.append("Username can only contain letters, numbers, underscores, and spaces")
         
         return errors
     
-    def _create_backup(self):
-        """Create a backup of the current CSV file."""
-        if self.csv_file_path.exists():
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_path = self.backup_dir / f"users_backup_{timestamp}.csv"
-            shutil.copy2(self.csv_file_path, backup_path)
+    def validate_many(self, records: Iterable[Dict]) -> List[List[str]]:
+        """
+        Validate a batch of user records, e.g. before an import.
+        
+        Args:
+            records: User dictionaries as accepted by create_user
             
-            # Keep only the last 10 backups
-            backups = sorted(self.backup_dir.glob("users_backup_*.csv"))
-            if len(backups) > 10:
-                for old_backup in backups[:-10]:
-                    old_backup.unlink()
-    
-    def _read_all_users(self) -> List[Dict]:
-        """Read all users from the CSV file."""
-        users = []
+        Returns:
+            One list of validation errors per record, in input order
+        """
+        validate = self._validate_input
+        return [validate(record) for record in records]
+    
+    def _snapshot_bytes(self) -> bytes:
+        """Encode the current table, journal applied, as a complete CSV file."""
+        with self._locked(shared=True):
+            table = self._ensure_loaded()
+            users = list(table.users)
+        
+        buffer = io.StringIO()
+        write_user_records(buffer, users)
+        return buffer.getvalue().encode('utf-8')
+    
+    def _load_table(self):
+        """Load every row from storage and rebuild the resident table."""
+        users = self.storage.load()
+        
+        max_id = 0
+        for user in users:
+            user_id = user.id
+            if user_id.isdigit() and int(user_id) > max_id:
+                max_id = int(user_id)
+        
+        # Restore the ID sequence from the table and the sidecar, whichever is ahead
+        self._next_id = max(max_id, self._read_sequence()) + 1
+        self._table = _UserTable(users)
+        
+        # Rows may have changed in ways no event described (another process,
+        # a restore, a failed batch): tell listeners to start over
+        if self._table_loaded:
+            self._notify([{'type': 'reloaded', 'version': self._version(self._table)}])
+        self._table_loaded = True
+    
+    def _ensure_loaded(self) -> _UserTable:
+        """
+        Reload the resident table only if the storage changed on disk.
+        
+        Concurrent readers may call this together; only one of them reloads.
+        
+        Returns:
+            The current table
+        """
+        if self.storage.is_stale():
+            with self._load_lock:
+                if self.storage.is_stale():
+                    self._load_table()
+        return self._table
+    
+    def _invalidate(self):
+        """Force the next access to reload the table from storage."""
+        self.storage.invalidate()
+    
+    def _read_sequence(self) -> int:
+        """Read the last allocated user ID from the sequence sidecar."""
         try:
-            with open(self.csv_file_path, 'r', newline='', encoding='utf-8') as file:
-                reader = csv.DictReader(file)
-                users = list(reader)
-        except FileNotFoundError:
-            pass
-        return users
+            with open(self.seq_file_path, 'rb') as file:
+                return int(file.read(32).strip() or 0)
+        except (FileNotFoundError, ValueError):
+            return 0
     
-    def _write_all_users(self, users: List[Dict]):
-        """Write all users to the CSV file."""
-        with open(self.csv_file_path, 'w', newline='', encoding='utf-8') as file:
-            writer = csv.DictWriter(file, fieldnames=self.headers)
-            writer.writeheader()
-            writer.writerows(users)
+    def _write_sequence(self, last_id: int):
+        """
+        Persist the last allocated user ID with a fixed-width in-place write.
+        
+        The sidecar is not fsynced: the fsynced CSV row is authoritative and
+        restores the sequence on its own if the sidecar lags behind.
+        """
+        fd = os.open(self.seq_file_path, os.O_WRONLY | os.O_CREAT | getattr(os, 'O_BINARY', 0), 0o644)
+        try:
+            os.write(fd, b'%020d\n' % last_id)
+        finally:
+            os.close(fd)
     
     def _generate_user_id(self) -> str:
-        """Generate a unique user ID."""
-        users = self._read_all_users()
-        if not users:
-            return "1"
+        """
+        Allocate the next user ID from the in-memory sequence.
+        
+        The sidecar is updated when the write batch is flushed.
+        """
+        user_id = self._next_id
+        self._next_id += 1
+        return str(user_id)
+    
+    def _commit(self, operation: Callable, on_error: Callable) -> Dict:
+        """
+        Run a table write as part of a group commit.
+        
+        Concurrent writers queue their operations. The first becomes the
+        leader: it applies every queued operation under one write lock,
+        flushes them to storage together, hands each caller its own result
+        and passes leadership to the next queued writer, if any.
+        
+        Args:
+            operation: Callable(table, batch) applying the write and
+                returning its result dictionary
+            on_error: Callable(exception) returning the failure result
+        """
+        request = _CommitRequest(operation, on_error)
+        with self._commit_mutex:
+            self._commit_queue.append(request)
+            if not self._committing:
+                self._committing = True
+                request.leader = True
+        
+        if not request.leader:
+            request.done.wait()
+            if not request.leader:
+                return request.result
+        
+        if self.group_commit_window > 0:
+            time.sleep(self.group_commit_window)
+        with self._commit_mutex:
+            requests, self._commit_queue = self._commit_queue, []
+        
+        self._run_batch(requests)
         
-        # Find the highest ID and increment
-        max_id = max(int(user.get('id', 0)) for user in users)
-        return str(max_id + 1)
+        with self._commit_mutex:
+            if self._commit_queue:
+                successor = self._commit_queue[0]
+                successor.leader = True
+                successor.done.set()
+            else:
+                self._committing = False
+        return request.result
+    
+    def _run_batch(self, requests: List[_CommitRequest]):
+        """
+        Apply queued writes under one lock and flush them with one storage write.
+        
+        If the flush fails, the requests are retried one at a time, so only
+        the write the storage rejects fails.
+        """
+        events = []
+        try:
+            with self._locked():
+                table = self._ensure_loaded()
+                batch = _WriteBatch(len(table.users))
+                failed = False
+                for request in requests:
+                    try:
+                        request.result = request.operation(table, batch)
+                    except Exception as e:
+                        failed = True
+                        request.result = request.on_error(e)
+                
+                self._flush_batch(table, batch)
+                if self._listeners:
+                    events = self._batch_events(table, batch)
+                if failed:
+                    # A failed operation may have left the table half-changed
+                    self._invalidate()
+            self._notify(events)
+        except Exception as e:
+            # Nothing in the batch is known to be durable: reload from storage
+            self._invalidate()
+            if len(requests) > 1:
+                # Retry one request at a time so a write the storage rejects
+                # fails alone instead of failing everyone queued with it
+                for request in requests:
+                    self._run_batch([request])
+                return
+            for request in requests:
+                request.result = request.on_error(e)
+        finally:
+            for request in requests:
+                if not request.leader:
+                    request.done.set()
+    
+    def _batch_events(self, table: _UserTable, batch: _WriteBatch) -> List[Dict]:
+        """Describe the rows a flushed batch created or changed, for listeners."""
+        version = self._version(table)
+        events = [
+            {'type': 'created', 'user': user.to_dict(SAFE_FIELDS), 'version': version}
+            for user in table.users[batch.base:]
+        ]
+        for position, changes in batch.updated.items():
+            if not set(changes) - set(SENSITIVE_FIELDS) - {'updated_at'}:
+                continue  # e.g. a password rehash: nothing a listener can see
+            event_type = 'deactivated' if changes.get('is_active') == 'false' else 'updated'
+            events.append({'type': event_type, 'user': table.users[position].to_dict(SAFE_FIELDS),
+                           'version': version})
+        return events
+    
+    def _flush_batch(self, table: _UserTable, batch: _WriteBatch):
+        """Persist the rows a batch created or changed."""
+        created = table.users[batch.base:]
+        if created:
+            self._write_sequence(self._next_id - 1)
+            self.storage.append_many(created)
+        if batch.updated:
+            self.storage.update_many([
+                (table.users[position], changes)
+                for position, changes in batch.updated.items()
+            ])
+        if batch.writes:
+            self.backups.record_write(batch.writes)
+        
+        if self.compact_threshold and self.storage.journal_records >= self.compact_threshold:
+            self._schedule_compaction()
     
     def create_user(self, user_data: Dict) -> Dict:
         """
@@ -158,59 +1074,209 @@ class CSVUserManager:
         Returns:
             Dictionary with success status and message
         """
-        with self.lock:
-            try:
-                # Validate input
-                errors = self._validate_input(user_data)
-                if errors:
-                    return {'success': False, 'errors': errors}
-                
-                # Check if user already exists
-                users = self._read_all_users()
-                
-                # Check for duplicate username or email
-                for user in users:
-                    if user.get('username') == user_data['username']:
-                        return {'success': False, 'errors': ['Username already exists']}
-                    if user.get('email') == user_data['email']:
-                        return {'success': False, 'errors': ['Email already exists']}
-                
-                # Create backup before modification
-                self._create_backup()
-                
-                # Prepare user data
-                salt = self._generate_salt()
-                password_hash = self._hash_password(user_data['password'], salt)
-                current_time = datetime.now().isoformat()
-                
-                new_user = {
-                    'id': self._generate_user_id(),
-                    'username': user_data['username'],
-                    'email': user_data['email'],
-                    'password_hash': password_hash,
-                    'salt': salt,
-                    'hospital_name': user_data.get('hospital_name', ''),
-                    'hospital_id': user_data.get('hospital_id', ''),
-                    'license_id': user_data.get('license_id', ''),
-                    'created_at': current_time,
-                    'updated_at': current_time,
-                    'is_active': 'true'
-                }
-                
-                # Add new user to the list
-                users.append(new_user)
+        try:
+            # Validate input
+            errors = self._validate_input(user_data)
+            if errors:
+                return {'success': False, 'errors': errors}
+            
+            # Hash before taking the lock so a slow hasher does not block others
+            salt = self._generate_salt()
+            password_hash = self._hash_password(user_data['password'], salt)
+            
+            return self._commit(
+                functools.partial(self._apply_create, user_data, password_hash, salt),
+                lambda e: {'success': False, 'errors': [f'Error creating user: {str(e)}']}
+            )
+            
+        except Exception as e:
+            return {'success': False, 'errors': [f'Error creating user: {str(e)}']}
+    
+    def _apply_create(self, user_data: Dict, password_hash: str, salt: str,
+                      table: _UserTable, batch: _WriteBatch) -> Dict:
+        """Group-commit operation for create_user."""
+        # Check for duplicate username or email
+        if user_data['username'] in table.username_index:
+            return {'success': False, 'errors': ['Username already exists']}
+        if user_data['email'] in table.email_index:
+            return {'success': False, 'errors': ['Email already exists']}
+        
+        # Prepare user data
+        current_time = datetime.now().isoformat()
+        
+        new_user = UserRecord(
+            id=self._generate_user_id(),
+            username=user_data['username'],
+            email=user_data['email'],
+            password_hash=password_hash,
+            salt=salt,
+            hospital_name=user_data.get('hospital_name', ''),
+            hospital_id=user_data.get('hospital_id', ''),
+            license_id=user_data.get('license_id', ''),
+            created_at=current_time,
+            updated_at=current_time,
+            is_active='true'
+        )
+        
+        # Reject a row the storage cannot hold now, so it fails alone rather
+        # than failing the flush for the whole batch
+        try:
+            self.storage.check(new_user)
+        except ValueError as e:
+            self._next_id -= 1  # give back the ID just allocated
+            return {'success': False, 'errors': [str(e)]}
+        
+        # Add the row to the resident table; the batch flush appends it to storage
+        table.add(new_user)
+        batch.writes += 1
+        
+        return {
+            'success': True, 
+            'message': 'User created successfully',
+            'user_id': new_user.id
+        }
+    
+    def _hash_for_import(self, user_data: Dict) -> tuple:
+        """Return (password_hash, salt) for an imported record."""
+        if not user_data.get('password') and user_data.get('password_hash'):
+            # Already hashed, e.g. a users.csv exported from another instance
+            return user_data['password_hash'], user_data.get('salt', '')
+        salt = self._generate_salt()
+        return self._hash_password(user_data['password'], salt), salt
+    
+    def bulk_create_users(self, users: Iterable[Dict], batch_size: int = 1000) -> Dict:
+        """
+        Create many users at once, e.g. for migrations and imports.
+        
+        The input is consumed lazily in batches, so memory stays bounded for
+        any number of users. Each batch is validated in one pass, hashed on
+        the worker pool outside the lock, checked for duplicates against the
+        indexes, given a contiguous block of IDs and appended to storage in
+        a single write. One backup is taken at the end.
+        
+        Records take the same fields as create_user. A record without a
+        password but with password_hash (and salt) keeps that hash as is,
+        and is_active='false' imports a deactivated user. Other columns,
+        such as the id and timestamps of an exported users.csv, are ignored:
+        imported users get new IDs and creation times.
+        
+        Args:
+            users: Iterable of user dictionaries
+            batch_size: Number of records written per storage append
+            
+        Returns:
+            Dictionary with created/skipped counts and per-record errors
+        """
+        created = 0
+        failures = []
+        records = iter(users)
+        start = 0  # index of the first record in the batch being imported
+        next_start = 0
+        
+        try:
+            while True:
+                start = next_start
+                batch = list(itertools.islice(records, batch_size))
+                if not batch:
+                    break
+                next_start += len(batch)
                 
-                # Write back to CSV
-                self._write_all_users(users)
+                # Validate the fields create_user takes; pre-hashed records
+                # have no password to check
+                checked = []
+                for user_data in batch:
+                    fields = {field: user_data[field] for field in _CREATE_FIELDS if field in user_data}
+                    if not user_data.get('password') and user_data.get('password_hash'):
+                        fields['password'] = 'x'
+                    checked.append(fields)
+                pending = []
+                for index, (user_data, errors) in enumerate(zip(batch, self.validate_many(checked)), start):
+                    if errors:
+                        failures.append({'index': index, 'username': user_data.get('username', ''),
+                                         'errors': errors})
+                    else:
+                        pending.append((index, user_data))
                 
-                return {
-                    'success': True, 
-                    'message': 'User created successfully',
-                    'user_id': new_user['id']
-                }
+                # Hash before taking the lock, spread over the worker pool
+                hashes = list(self._verify_pool.map(
+                    self._hash_for_import, [user_data for _, user_data in pending]
+                ))
                 
-            except Exception as e:
-                return {'success': False, 'errors': [f'Error creating user: {str(e)}']}
+                with self._locked():
+                    table = self._ensure_loaded()
+                    
+                    # Check for duplicates against the table and within the
+                    # batch, and rows the storage cannot hold, so a bad row
+                    # fails alone; IDs follow on from the table's sequence
+                    current_time = datetime.now().isoformat()
+                    new_users = []
+                    usernames = set()
+                    emails = set()
+                    for (index, user_data), (password_hash, salt) in zip(pending, hashes):
+                        username, email = user_data['username'], user_data['email']
+                        if username in table.username_index or username in usernames:
+                            errors = ['Username already exists']
+                        elif email in table.email_index or email in emails:
+                            errors = ['Email already exists']
+                        else:
+                            new_user = UserRecord(
+                                id=str(self._next_id + len(new_users)),
+                                username=username,
+                                email=email,
+                                password_hash=password_hash,
+                                salt=salt,
+                                hospital_name=user_data.get('hospital_name', ''),
+                                hospital_id=user_data.get('hospital_id', ''),
+                                license_id=user_data.get('license_id', ''),
+                                created_at=current_time,
+                                updated_at=current_time,
+                                is_active='false' if user_data.get('is_active') == 'false' else 'true'
+                            )
+                            try:
+                                self.storage.check(new_user)
+                            except ValueError as e:
+                                errors = [str(e)]
+                            else:
+                                usernames.add(username)
+                                emails.add(email)
+                                new_users.append(new_user)
+                                continue
+                        failures.append({'index': index, 'username': username, 'errors': errors})
+                    
+                    if not new_users:
+                        continue
+                    
+                    # Allocate the block of IDs with one sequence write
+                    self._next_id += len(new_users)
+                    self._write_sequence(self._next_id - 1)
+                    
+                    # Append the whole batch to storage and the resident table
+                    self.storage.append_many(new_users)
+                    for new_user in new_users:
+                        table.add(new_user)
+                    created += len(new_users)
+            
+            if created:
+                self.backups.snapshot()
+                self._notify([{'type': 'reloaded', 'version': self.data_version()}])
+            
+            failures.sort(key=lambda failure: failure['index'])
+            return {
+                'success': True,
+                'message': f'Imported {created} users',
+                'created': created,
+                'skipped': len(failures),
+                'errors': failures
+            }
+            
+        except Exception as e:
+            return {
+                'success': False,
+                'created': created,
+                'skipped': len(failures),
+                'errors': failures + [{'index': start, 'username': '',
+                                       'errors': [f'Error importing users: {str(e)}']}]
+            }
     
     def authenticate_user(self, username: str, password: str) -> Dict:
         """
@@ -223,39 +1289,195 @@ class CSVUserManager:
         Returns:
             Dictionary with authentication result
         """
-        with self.lock:
-            try:
-                users = self._read_all_users()
-                
-                for user in users:
-                    if (user.get('username') == username and 
-                        user.get('is_active') == 'true'):
-                        
-                        # Verify password
-                        stored_hash = user.get('password_hash')
-                        salt = user.get('salt')
-                        
-                        if stored_hash and salt:
-                            computed_hash = self._hash_password(password, salt)
-                            if computed_hash == stored_hash:
-                                # Remove sensitive information
-                                safe_user = {k: v for k, v in user.items() 
-                                           if k not in ['password_hash', 'salt']}
-                                return {
-                                    'success': True,
-                                    'user': safe_user,
-                                    'message': 'Authentication successful'
-                                }
+        try:
+            with self._locked(shared=True):
+                table = self._ensure_loaded()
+                user = table.find(username=username)
+            
+            if user is not None and user.is_active == 'true' and user.password_hash:
                 
-                return {'success': False, 'message': 'Invalid username or password'}
+                cache = self._auth_cache
+                if cache is not None and cache.check(user, password):
+                    valid = True
+                else:
+                    # Verify on the worker pool, outside the lock; records are
+                    # never mutated, so this one stays consistent meanwhile
+                    valid = self._verify_pool.submit(self._check_password, user, password).result()
+                    if valid:
+                        if self._needs_rehash(user):
+                            self._rehash_password(user, password)
+                        elif cache is not None:
+                            cache.add(user, password)
                 
-            except Exception as e:
-                return {'success': False, 'message': f'Authentication error: {str(e)}'}
+                if valid:
+                    # Remove sensitive information
+                    safe_user = user.to_dict(SAFE_FIELDS)
+                    return {
+                        'success': True,
+                        'user': safe_user,
+                        'message': 'Authentication successful'
+                    }
+            else:
+                # Hash anyway, so unknown and inactive usernames take as
+                # long to reject as a wrong password
+                self._verify_pool.submit(self._check_dummy_password, password).result()
+            
+            return {'success': False, 'message': 'Invalid username or password'}
+            
+        except Exception as e:
+            return {'success': False, 'message': f'Authentication error: {str(e)}'}
+    
+    def _cache_generation(self) -> int:
+        """
+        Read the key generation from the cache itself, so bumping it (see
+        restore_backup) retires every process's cached users at once.
+        """
+        key = f"{self.cache_prefix}:generation"
+        generation = self.cache.get(key)
+        if generation is None:
+            self.cache.add(key, 1, None)
+            generation = self.cache.get(key, 1)
+        return generation
+    
+    def _cache_key(self, kind: str, value: str, generation: int) -> str:
+        """Build a cache key that is safe for any backend (no spaces, bounded length)."""
+        digest = hashlib.sha256(value.encode('utf-8')).hexdigest()[:32]
+        return f"{self.cache_prefix}:{generation}:{kind}:{digest}"
+    
+    def _uncache_user(self, user: UserRecord):
+        """Drop a user's cached lookups after a write."""
+        if self.cache is not None:
+            generation = self._cache_generation()
+            self.cache.delete_many([self._cache_key('id', user.id, generation),
+                                    self._cache_key('username', user.username, generation)])
+    
+    def cache_stats(self) -> Dict:
+        """
+        Get read-through cache counters for get_user.
+        
+        Returns:
+            Dictionary with hits, misses and whether a cache is configured
+        """
+        with self._stats_lock:
+            return {
+                'enabled': self.cache is not None,
+                'hits': self._cache_hits,
+                'misses': self._cache_misses,
+            }
+    
+    def data_version(self) -> str:
+        """
+        Get a token that changes whenever the user data changes.
+        
+        Checking it only stats the storage (reloading if another process
+        wrote), so it suits ETags and change polling.
+        
+        Returns:
+            Opaque version string
+        """
+        with self._locked(shared=True):
+            table = self._ensure_loaded()
+            return self._version(table)
+    
+    def _version(self, table: _UserTable) -> str:
+        """Version token of a table's current contents."""
+        return f"{_PROCESS_TAG}-{table.generation}-{table.version}"
+    
+    def add_listener(self, listener: Callable[[List[Dict]], None]):
+        """
+        Register a callback for row changes.
+        
+        The listener is called with a list of events once a write is
+        durable. Each event has a 'type' ('created', 'updated',
+        'deactivated' or 'reloaded') and a 'version' (see data_version);
+        all but 'reloaded' carry the row's non-sensitive fields as 'user'.
+        'reloaded' means rows changed without per-row events (another
+        process wrote, a backup was restored or a bulk import ran), so
+        listeners should re-read what they need.
+        
+        Listeners may run on a writer's thread while the manager is
+        locked: they must return quickly and must not call back into the
+        manager (hand the events to a queue instead). Exceptions they
+        raise are ignored.
+        
+        Args:
+            listener: Callable taking a list of event dictionaries
+        """
+        with self._listeners_lock:
+            self._listeners = self._listeners + (listener,)
+    
+    def remove_listener(self, listener: Callable[[List[Dict]], None]):
+        """Unregister a callback added with add_listener."""
+        with self._listeners_lock:
+            self._listeners = tuple(l for l in self._listeners if l != listener)
+    
+    def _notify(self, events: List[Dict]):
+        """Hand events to every listener."""
+        if not events:
+            return
+        for listener in self._listeners:
+            try:
+                listener(events)
+            except Exception:
+                pass  # a broken listener must not fail the write
+    
+    def session_stamp(self, user_id: str, secret: str) -> Optional[str]:
+        """
+        Get a short version stamp for a user's login session.
+        
+        The stamp changes whenever the password changes or the account is
+        deactivated, so a session that stored it at login can be revoked
+        by comparing it again. It is keyed by a server secret because
+        signed-cookie sessions are readable by the client.
+        
+        Args:
+            user_id: User's ID
+            secret: Server secret (e.g. settings.SECRET_KEY)
+        
+        Returns:
+            Hex stamp, or None if the user does not exist or is inactive
+        """
+        with self._locked(shared=True):
+            user = self._ensure_loaded().find(user_id=user_id)
+            if user is None or user.is_active != 'true':
+                return None
+            return self._stamp(user, secret)
+    
+    def _stamp(self, user: UserRecord, secret: str) -> str:
+        """HMAC of the fields whose change revokes a session."""
+        message = f"{user.id}:{user.password_hash}:{user.salt}"
+        return hmac.new(secret.encode(), message.encode(), hashlib.sha256).hexdigest()[:20]
+    
+    def session_user(self, user_id: str, stamp: str, secret: str) -> Optional[Dict]:
+        """
+        Resolve a session's user in one lookup, checking its stamp.
+        
+        Args:
+            user_id: User ID stored in the session
+            stamp: Stamp stored in the session by session_stamp()
+            secret: Server secret the stamp was made with
+            
+        Returns:
+            User data without sensitive fields, or None if the session was
+            revoked (user missing or inactive, or password changed)
+        """
+        if not user_id or not stamp:
+            return None
+        with self._locked(shared=True):
+            user = self._ensure_loaded().find(user_id=user_id)
+            if user is None or user.is_active != 'true':
+                return None
+            if not hmac.compare_digest(self._stamp(user, secret), stamp):
+                return None
+            return user.to_dict(SAFE_FIELDS)
     
     def get_user(self, user_id: str = None, username: str = None) -> Dict:
         """
         Get a user by ID or username.
         
+        With a cache configured, lookups by one key are served from the
+        cache and only misses read the resident table.
+        
         Args:
             user_id: User's ID
             username: User's username
@@ -263,24 +1485,67 @@ class CSVUserManager:
         Returns:
             Dictionary with user data or error message
         """
-        with self.lock:
+        cache_key = None
+        if self.cache is not None and bool(user_id) != bool(username):
             try:
-                users = self._read_all_users()
+                generation = self._cache_generation()
+                cache_key = (self._cache_key('id', user_id, generation) if user_id
+                             else self._cache_key('username', username, generation))
+                cached = self.cache.get(cache_key)
+            except Exception:
+                cache_key = cached = None
+            with self._stats_lock:
+                if cached is not None:
+                    self._cache_hits += 1
+                else:
+                    self._cache_misses += 1
+            if cached is not None:
+                return {'success': True, 'user': dict(cached)}
+        
+        with self._locked(shared=True):
+            try:
+                table = self._ensure_loaded()
                 
-                for user in users:
-                    if ((user_id and user.get('id') == user_id) or 
-                        (username and user.get('username') == username)):
-                        
-                        # Remove sensitive information
-                        safe_user = {k: v for k, v in user.items() 
-                                   if k not in ['password_hash', 'salt']}
-                        return {'success': True, 'user': safe_user}
+                user = table.find(user_id=user_id, username=username)
+                if user is not None:
+                    # Remove sensitive information
+                    safe_user = user.to_dict(SAFE_FIELDS)
+                    
+                    # Fill the cache while writers are still locked out, so
+                    # a concurrent write cannot be overtaken by stale data
+                    if cache_key is not None:
+                        try:
+                            self.cache.set(cache_key, safe_user, self.cache_timeout)
+                        except Exception:
+                            pass  # the cache is an optimisation only
+                    return {'success': True, 'user': dict(safe_user)}
                 
                 return {'success': False, 'message': 'User not found'}
                 
             except Exception as e:
                 return {'success': False, 'message': f'Error retrieving user: {str(e)}'}
     
+    def _replace_user(self, table: _UserTable, batch: _WriteBatch, position: int, changes: Dict):
+        """Swap in a new record for a resident row and stage its changed fields."""
+        previous = table.users[position]
+        user = previous.replace(**changes)
+        changes = {k: v for k, v in changes.items() if getattr(previous, k) != v}
+        
+        self._uncache_user(user)
+        table.replace(position, user)
+        if position < batch.base:
+            batch.updated.setdefault(position, {}).update(changes)
+        batch.writes += 1
+    
+    def _schedule_compaction(self):
+        """Fold the journal into a new snapshot on a background thread."""
+        if self._compaction_thread is not None and self._compaction_thread.is_alive():
+            return
+        self._compaction_thread = threading.Thread(
+            target=self.compact, name='csv-user-compaction', daemon=True
+        )
+        self._compaction_thread.start()
+    
     def update_user(self, user_id: str, update_data: Dict) -> Dict:
         """
         Update a user's information.
@@ -292,45 +1557,56 @@ class CSVUserManager:
         Returns:
             Dictionary with update result
         """
-        with self.lock:
-            try:
-                users = self._read_all_users()
-                user_found = False
-                
-                for i, user in enumerate(users):
-                    if user.get('id') == user_id:
-                        user_found = True
-                        
-                        # Create backup before modification
-                        self._create_backup()
-                        
-                        # Update allowed fields
-                        updatable_fields = ['hospital_name', 'hospital_id', 'license_id', 'email']
-                        for field in updatable_fields:
-                            if field in update_data:
-                                user[field] = update_data[field]
-                        
-                        # Update password if provided
-                        if 'password' in update_data:
-                            salt = self._generate_salt()
-                            password_hash = self._hash_password(update_data['password'], salt)
-                            user['password_hash'] = password_hash
-                            user['salt'] = salt
-                        
-                        user['updated_at'] = datetime.now().isoformat()
-                        users[i] = user
-                        break
-                
-                if not user_found:
-                    return {'success': False, 'message': 'User not found'}
-                
-                # Write back to CSV
-                self._write_all_users(users)
-                
-                return {'success': True, 'message': 'User updated successfully'}
-                
-            except Exception as e:
-                return {'success': False, 'message': f'Error updating user: {str(e)}'}
+        try:
+            changes = {}
+            
+            # Update password if provided, hashing before taking the lock
+            if 'password' in update_data:
+                salt = self._generate_salt()
+                password_hash = self._hash_password(update_data['password'], salt)
+                changes['password_hash'] = password_hash
+                changes['salt'] = salt
+            
+            return self._commit(
+                functools.partial(self._apply_update, user_id, update_data, changes),
+                lambda e: {'success': False, 'message': f'Error updating user: {str(e)}'}
+            )
+            
+        except Exception as e:
+            return {'success': False, 'message': f'Error updating user: {str(e)}'}
+    
+    def _apply_update(self, user_id: str, update_data: Dict, changes: Dict,
+                      table: _UserTable, batch: _WriteBatch) -> Dict:
+        """Group-commit operation for update_user."""
+        position = table.id_index.get(user_id)
+        if position is None:
+            return {'success': False, 'message': 'User not found'}
+        
+        # Emails stay unique, as create_user requires, whatever the backend
+        email = update_data.get('email')
+        if email and table.email_index.get(email, position) != position:
+            return {'success': False, 'message': 'Email already exists'}
+        
+        # Update allowed fields
+        updatable_fields = ['hospital_name', 'hospital_id', 'license_id', 'email']
+        for field in updatable_fields:
+            if field in update_data:
+                changes[field] = update_data[field]
+        
+        changes['updated_at'] = datetime.now().isoformat()
+        
+        try:
+            self.storage.check(table.users[position].replace(**changes))
+        except ValueError as e:
+            return {'success': False, 'message': str(e)}
+        
+        # Stage the change
+        self._replace_user(table, batch, position, changes)
+        
+        if 'password' in update_data and self._auth_cache is not None:
+            self._auth_cache.invalidate(table.users[position].username)
+        
+        return {'success': True, 'message': 'User updated successfully'}
     
     def delete_user(self, user_id: str) -> Dict:
         """
@@ -342,34 +1618,240 @@ class CSVUserManager:
         Returns:
             Dictionary with deletion result
         """
-        with self.lock:
+        return self._commit(
+            functools.partial(self._apply_delete, user_id),
+            lambda e: {'success': False, 'message': f'Error deleting user: {str(e)}'}
+        )
+    
+    def _apply_delete(self, user_id: str, table: _UserTable, batch: _WriteBatch) -> Dict:
+        """Group-commit operation for delete_user."""
+        position = table.id_index.get(user_id)
+        if position is None:
+            return {'success': False, 'message': 'User not found'}
+        
+        # Soft delete
+        changes = {
+            'is_active': 'false',
+            'updated_at': datetime.now().isoformat()
+        }
+        
+        # Stage the change
+        self._replace_user(table, batch, position, changes)
+        
+        if self._auth_cache is not None:
+            self._auth_cache.invalidate(table.users[position].username)
+        
+        return {'success': True, 'message': 'User deleted successfully'}
+    
+    def compact(self) -> Dict:
+        """
+        Fold the storage journal into a fresh snapshot.
+        
+        For CSV storage the snapshot is swapped in with an atomic rename
+        before the journal is replaced by an empty one. Runs automatically
+        in the background once the journal holds compact_threshold records.
+        
+        Returns:
+            Dictionary with compaction result
+        """
+        with self._locked():
             try:
-                users = self._read_all_users()
-                user_found = False
-                
-                for i, user in enumerate(users):
-                    if user.get('id') == user_id:
-                        user_found = True
-                        
-                        # Create backup before modification
-                        self._create_backup()
-                        
-                        # Soft delete
-                        user['is_active'] = 'false'
-                        user['updated_at'] = datetime.now().isoformat()
-                        users[i] = user
-                        break
-                
-                if not user_found:
-                    return {'success': False, 'message': 'User not found'}
-                
-                # Write back to CSV
-                self._write_all_users(users)
-                
-                return {'success': True, 'message': 'User deleted successfully'}
+                table = self._ensure_loaded()
+                self.storage.compact(table.users)
+                return {'success': True, 'message': 'User storage compacted successfully'}
+            except Exception as e:
+                self._invalidate()
+                return {'success': False, 'message': f'Error compacting user storage: {str(e)}'}
+    
+    def list_backups(self) -> Dict:
+        """
+        List stored backups, newest first.
+        
+        Returns:
+            Dictionary with backup manifest entries
+        """
+        try:
+            return {'success': True, 'backups': self.backups.list_backups()}
+        except Exception as e:
+            return {'success': False, 'message': f'Error listing backups: {str(e)}'}
+    
+    def verify_backups(self) -> Dict:
+        """
+        Verify that every stored backup is readable and matches its digest.
+        
+        Returns:
+            Dictionary with verification result
+        """
+        try:
+            return self.backups.verify()
+        except Exception as e:
+            return {'success': False, 'errors': [f'Error verifying backups: {str(e)}']}
+    
+    def restore_backup(self, digest: str = None) -> Dict:
+        """
+        Replace the user table with a stored backup.
+        
+        Args:
+            digest: Backup digest (defaults to the newest backup)
+            
+        Returns:
+            Dictionary with restore result
+        """
+        with self._locked():
+            try:
+                data = self.backups.read_backup(digest)
+                users = read_user_records(io.StringIO(data.decode('utf-8')))
+                self.storage.replace_all(users)
+                self._invalidate()
+                if self.cache is not None:
+                    key = f"{self.cache_prefix}:generation"
+                    try:
+                        self.cache.incr(key)
+                    except ValueError:  # not set yet, or evicted
+                        self.cache.add(key, 2, None)
+                if self._auth_cache is not None:
+                    self._auth_cache.clear()
                 
+                return {'success': True, 'message': 'Backup restored successfully'}
             except Exception as e:
-                return {'success': False, 'message': f'Error deleting user: {str(e)}'}
+                self._invalidate()
+                return {'success': False, 'message': f'Error restoring backup: {str(e)}'}
+    
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """
+        Wait for requested background backups and any search index build.
+        
+        Returns:
+            True if they finished before the timeout
+        """
+        search = self._search_thread
+        if search is not None:
+            search.join(timeout)
+            if search.is_alive():
+                return False
+        return self.backups.flush(timeout)
+    
+    def close(self, timeout: Optional[float] = None):
+        """
+        Stop background work and release the manager's files.
+        
+        Requested backups and a running compaction are finished first. The
+        manager must not be used afterwards.
+        """
+        self.backups.close(timeout)
+        for thread in (self._compaction_thread, self._search_thread):
+            if thread is not None:
+                thread.join(timeout)
+        self._verify_pool.shutdown(wait=True)
+        with self._locked():
+            self.storage.close()
+        if self._process_lock is not None:
+            self._process_lock.close()
+    
+    def iter_users(self, offset: int = 0, limit: Optional[int] = None,
+                   fields: Optional[List[str]] = None,
+                   active_only: bool = True) -> Iterator[Dict]:
+        """
+        Stream users one safe dictionary at a time.
+        
+        Only the requested page is materialized, and password hashes and
+        salts are never copied out of the table.
+        
+        Args:
+            offset: Number of matching users to skip
+            limit: Maximum number of users to yield (None for all)
+            fields: Fields to include (defaults to every non-sensitive field)
+            active_only: If True, yield only active users
+            
+        Yields:
+            User dictionaries without sensitive fields
+        """
+        fields = [f for f in (fields or self.headers) if f in self.headers and f not in SENSITIVE_FIELDS]
+        
+        with self._locked(shared=True):
+            table = self._ensure_loaded()
+        
+        # Rows are never removed from a table and updates swap in whole
+        # rows, so the table can be walked without holding the lock
+        if limit is not None and limit <= 0:
+            return
+        skipped = 0
+        yielded = 0
+        for user in table.users:
+            if active_only and user.is_active != 'true':
+                continue
+            if skipped < offset:
+                skipped += 1
+                continue
+            yield {field: getattr(user, field, '') for field in fields}
+            yielded += 1
+            if limit is not None and yielded >= limit:
+                return
+    
+    def get_stats(self) -> Dict:
+        """
+        Get dashboard statistics without scanning the users.
+        
+        The counts are maintained as rows are written, so this costs the
+        same for ten users as for a hundred thousand.
+        
+        Returns:
+            Dictionary with user counts, users per hospital (sorted by
+            name), the creation-date range and the data version
+        """
+        with self._locked(shared=True):
+            table = self._ensure_loaded()
+            stats = table.stats
+            return {
+                'total_users': stats.total,
+                'active_users': stats.active,
+                'inactive_users': stats.total - stats.active,
+                'unique_hospitals': len(stats.hospitals),
+                'hospitals': dict(sorted(stats.hospitals.items())),
+                'first_created': stats.first_created,
+                'last_created': stats.last_created,
+                'version': self._version(table),
+            }
+    
+    def iter_csv(self, fields: Optional[List[str]] = None, active_only: bool = False,
+                 chunk_size: int = 64 * 1024) -> Iterator[str]:
+        """
+        Stream users as CSV text in chunks of about chunk_size characters.
+        
+        Rows come from iter_users, so memory stays flat however many users
+        there are, and password hashes and salts are never written.
+        
+        Args:
+            fields: Columns to include (defaults to every non-sensitive field)
+            active_only: If True, export only active users
+            chunk_size: Approximate number of characters per chunk
+            
+        Yields:
+            CSV text, starting with the header row
+        """
+        fields = [f for f in (fields or self.headers) if f in self.headers and f not in SENSITIVE_FIELDS]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        for user in self.iter_users(fields=fields, active_only=active_only):
+            writer.writerow([user[field] for field in fields])
+            if buffer.tell() >= chunk_size:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        if buffer.tell():
+            yield buffer.getvalue()
+    
+    def count_users(self, active_only: bool = True) -> int:
+        """
+        Count users without copying them.
+        
+        Args:
+            active_only: If True, count only active users
+        """
+        with self._locked(shared=True):
+            table = self._ensure_loaded()
+            return table.stats.active if active_only else table.stats.total
     
     def list_users(self, active_only: bool = True) -> Dict:
         """
@@ -381,21 +1863,107 @@ class CSVUserManager:
         Returns:
             Dictionary with user list
         """
-        with self.lock:
+        with self._locked(shared=True):
             try:
-                users = self._read_all_users()
-                
-                if active_only:
-                    users = [user for user in users if user.get('is_active') == 'true']
+                table = self._ensure_loaded()
                 
                 # Remove sensitive information
                 safe_users = []
-                for user in users:
-                    safe_user = {k: v for k, v in user.items() 
-                               if k not in ['password_hash', 'salt']}
+                for user in table.users:
+                    if active_only and user.is_active != 'true':
+                        continue
+                    safe_user = user.to_dict(SAFE_FIELDS)
                     safe_users.append(safe_user)
                 
                 return {'success': True, 'users': safe_users}
                 
             except Exception as e:
                 return {'success': False, 'message': f'Error listing users: {str(e)}'}
+    
+    def _start_search_build(self, table: _UserTable):
+        """Index a table on a background thread, unless that is already under way."""
+        with self._search_lock:
+            if self._search_table is table or table.search is not None:
+                return
+            self._search_table = table
+            self._search_thread = threading.Thread(
+                target=self._build_search, args=(table,), name='csv-user-search', daemon=True
+            )
+            self._search_thread.start()
+    
+    def _build_search(self, table: _UserTable):
+        """
+        Build a table's search index without holding the table lock, so a
+        reload never blocks writers, then catch up on rows written meanwhile
+        under a brief shared lock.
+        """
+        try:
+            rows = table.users[:]
+            index = UserSearchIndex(rows)
+            with self._locked(shared=True):
+                users = table.users
+                for position, user in enumerate(rows):
+                    if users[position] is not user:
+                        index.replace(position, users[position])
+                for position in range(len(rows), len(users)):
+                    index.add(position, users[position])
+                table.search = index
+        finally:
+            with self._search_lock:
+                if self._search_table is table:
+                    self._search_table = None
+    
+    def search_users(self, query: str, limit: Optional[int] = None, offset: int = 0,
+                     mode: str = 'ranked', fields: Optional[List[str]] = None,
+                     active_only: bool = False) -> Dict:
+        """
+        Search username, email and hospital name through the trigram index.
+        
+        Matching is case-insensitive. 'substring' and 'prefix' return
+        matches in table order; 'ranked' puts exact field matches first,
+        then field prefixes, then word prefixes, then other substrings.
+        Until the index for a freshly loaded table is built in the
+        background, searches scan the rows with the same results.
+        
+        Args:
+            query: Text to search for
+            limit: Maximum number of users to return (None for all)
+            offset: Number of matches to skip
+            mode: 'ranked', 'prefix' or 'substring'
+            fields: Fields to include (defaults to every non-sensitive field)
+            active_only: If True, match only active users
+            
+        Returns:
+            Dictionary with the page of users and the total number of matches
+        """
+        fields = [f for f in (fields or self.headers) if f in self.headers and f not in SENSITIVE_FIELDS]
+        query = normalize_query(query or '')
+        
+        with self._locked(shared=True):
+            try:
+                table = self._ensure_loaded()
+                if table.search is None:
+                    # Scan until the background build has indexed this table
+                    self._start_search_build(table)
+                    matches = scan_users(table.users, query, mode)
+                else:
+                    matches = table.search.search(query, mode)
+                if active_only:
+                    matches = [m for m in matches if table.users[m[1]].is_active == 'true']
+                
+                end = None if limit is None else offset + max(limit, 0)
+                if mode == 'ranked':
+                    page = sorted(matches) if end is None else heapq.nsmallest(end, matches)
+                else:
+                    page = matches[:end]
+                
+                users = [
+                    {field: getattr(table.users[position], field, '') for field in fields}
+                    for _, position in page[offset:]
+                ]
+                return {'success': True, 'users': users, 'total': len(matches)}
+                
+            except ValueError as e:
+                return {'success': False, 'message': str(e)}
+            except Exception as e:
+                return {'success': False, 'message': f'Error searching users: {str(e)}'}
@@ -0,0 +1,77 @@
+"""
+Bulk import users into the CSV user store.
+
+    python manage.py import_users users.csv
+    python manage.py import_users --from-django --default-password <password>
+
+Rows are streamed in batches through CSVUserManager.bulk_create_users, so
+memory use does not grow with the size of the input.
+"""
+
+import csv
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.user_manager import csv_manager
+
+
+class Command(BaseCommand):
+    help = 'Import users from a CSV file or the Django auth database into the CSV user store'
+
+    def add_arguments(self, parser):
+        parser.add_argument('csv_file', nargs='?',
+                            help="CSV file with a header row ('-' for stdin)")
+        parser.add_argument('--from-django', action='store_true',
+                            help='Import django.contrib.auth users instead of a CSV file')
+        parser.add_argument('--default-password',
+                            help='Password for rows without one (required with --from-django)')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Users written per storage append (default: 1000)')
+
+    def handle(self, *args, **options):
+        if options['from_django']:
+            if not options['default_password']:
+                raise CommandError('--default-password is required with --from-django')
+            users = self._django_users(options['default_password'], options['batch_size'])
+        elif options['csv_file']:
+            users = self._csv_users(options['csv_file'], options['default_password'])
+        else:
+            raise CommandError('Give a CSV file or --from-django')
+
+        result = csv_manager.bulk_create_users(users, batch_size=options['batch_size'])
+
+        for failure in result['errors']:
+            self.stderr.write(f"Skipped row {failure['index']} ({failure['username']}): "
+                              f"{'; '.join(failure['errors'])}")
+        if not result['success']:
+            raise CommandError(f"Import stopped after {result['created']} users")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['created']} users, skipped {result['skipped']}"
+        ))
+
+    def _csv_users(self, path, default_password):
+        """Stream user dictionaries from a CSV file."""
+        file = sys.stdin if path == '-' else open(path, newline='', encoding='utf-8')
+        try:
+            for row in csv.DictReader(file):
+                if default_password and not row.get('password') and not row.get('password_hash'):
+                    row['password'] = default_password
+                yield row
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+    def _django_users(self, default_password, batch_size):
+        """Stream user dictionaries from django.contrib.auth without loading them all."""
+        from django.contrib.auth.models import User
+
+        for django_user in User.objects.order_by('pk').iterator(chunk_size=batch_size):
+            yield {
+                'username': django_user.username,
+                'email': django_user.email if django_user.email else f"{django_user.username}@example.com",
+                'password': default_password,
+                'hospital_name': django_user.username,
+                'hospital_id': django_user.first_name if django_user.first_name else f"H{django_user.id:03d}",
+                'license_id': f"LIC{django_user.id:03d}"
+            }
@@ -0,0 +1,77 @@
+"""
+Request-scoped user context for views backed by the CSV user manager.
+
+CSVUserMiddleware attaches a lazy ``request.csv_user``: the logged-in
+user's data (without sensitive fields), resolved at most once per request
+from the session and the manager's in-memory index, or an empty dict for
+anonymous or revoked sessions. Views wrapped with @login_required
+redirect to the login page when there is no user; the middleware does the
+same before the view is called, but the decorator does not depend on it.
+"""
+
+import functools
+
+from django.conf import settings
+from django.contrib import messages
+from django.shortcuts import redirect
+from django.utils.functional import SimpleLazyObject
+from django.utils.module_loading import import_string
+
+
+def login_required(view_func):
+    """Redirect to the login page unless the request has a logged-in user."""
+    @functools.wraps(view_func)
+    def wrapper(request, *args, **kwargs):
+        if not hasattr(request, 'csv_user'):
+            # Not served through CSVUserMiddleware, e.g. a RequestFactory request
+            request.csv_user = SimpleLazyObject(lambda: get_csv_user(request))
+        if not request.csv_user:
+            return _login_redirect(request)
+        return view_func(request, *args, **kwargs)
+
+    wrapper.csv_login_required = True
+    return wrapper
+
+
+def _login_redirect(request):
+    """Send an anonymous request to the login page."""
+    # fail_silently: the messages middleware may be missing too
+    messages.error(request, 'Please login to access this page.', fail_silently=True)
+    return redirect('login')
+
+
+def get_csv_user(request) -> dict:
+    """
+    Resolve the session's user, flushing the session if it was revoked.
+
+    Args:
+        request: Request with a session
+
+    Returns:
+        User data, or an empty dict if nobody is logged in
+    """
+    session = getattr(request, 'session', None)
+    if session is None or not session.get('is_logged_in'):
+        return {}
+    manager = import_string(getattr(settings, 'USER_MANAGER', 'core.user_manager.csv_manager'))
+    user = manager.session_user(session.get('user_id'), session.get('user_stamp'), settings.SECRET_KEY)
+    if user is None:
+        session.flush()
+        return {}
+    return user
+
+
+class CSVUserMiddleware:
+    """Attach request.csv_user and enforce @login_required."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request.csv_user = SimpleLazyObject(lambda: get_csv_user(request))
+        return self.get_response(request)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if getattr(view_func, 'csv_login_required', False) and not request.csv_user:
+            return _login_redirect(request)
+        return None
@@ -0,0 +1,155 @@
+"""
+Password hashers for the CSV User Management System.
+
+Hashes are stored self-describing in the password_hash column as
+``algorithm$parameters$salt$hash``, so the cost can be raised later and
+old hashes are still verified and upgraded on the next login:
+
+- PBKDF2SHA256Hasher: ``pbkdf2_sha256$<iterations>$<salt>$<hex hash>``
+- ScryptHasher: ``scrypt$<n>$<r>$<p>$<salt>$<hex hash>``
+- LegacySHA256Hasher: the original bare SHA-256 hex digest of
+  password + salt, with the salt in its own column
+
+hashlib releases the GIL while it runs PBKDF2 and scrypt, so verifying
+on worker threads uses several cores at once.
+"""
+
+import hashlib
+import hmac
+from typing import Optional, Union
+
+
+class PasswordHasher:
+    """Base class for password hashers."""
+
+    algorithm = ''
+
+    def encode(self, password: str, salt: str) -> str:
+        """Hash a password and return the stored form."""
+        raise NotImplementedError
+
+    def verify(self, password: str, encoded: str, salt: str = '') -> bool:
+        """Check a password against a stored hash."""
+        raise NotImplementedError
+
+    def must_update(self, encoded: str) -> bool:
+        """Return True if a hash this hasher produced used weaker parameters."""
+        return False
+
+
+class LegacySHA256Hasher(PasswordHasher):
+    """Single round of SHA-256 over password + salt, kept for old rows."""
+
+    algorithm = 'sha256'
+
+    def encode(self, password: str, salt: str) -> str:
+        return hashlib.sha256((password + salt).encode()).hexdigest()
+
+    def verify(self, password: str, encoded: str, salt: str = '') -> bool:
+        if not salt:
+            return False
+        return hmac.compare_digest(self.encode(password, salt), encoded)
+
+
+class PBKDF2SHA256Hasher(PasswordHasher):
+    """PBKDF2-HMAC-SHA256 with a tunable iteration count."""
+
+    algorithm = 'pbkdf2_sha256'
+
+    def __init__(self, iterations: int = 600000):
+        self.iterations = iterations
+
+    def _derive(self, password: str, salt: str, iterations: int) -> str:
+        return hashlib.pbkdf2_hmac(
+            'sha256', password.encode(), salt.encode(), iterations
+        ).hex()
+
+    def encode(self, password: str, salt: str) -> str:
+        digest = self._derive(password, salt, self.iterations)
+        return f"{self.algorithm}${self.iterations}${salt}${digest}"
+
+    def verify(self, password: str, encoded: str, salt: str = '') -> bool:
+        try:
+            algorithm, iterations, salt, digest = encoded.split('$')
+            iterations = int(iterations)
+        except ValueError:
+            return False
+        if algorithm != self.algorithm:
+            return False
+        return hmac.compare_digest(self._derive(password, salt, iterations), digest)
+
+    def must_update(self, encoded: str) -> bool:
+        parts = encoded.split('$')
+        return len(parts) != 4 or parts[1] != str(self.iterations)
+
+
+class ScryptHasher(PasswordHasher):
+    """scrypt with tunable CPU/memory cost (n), block size (r) and parallelism (p)."""
+
+    algorithm = 'scrypt'
+
+    def __init__(self, n: int = 2 ** 14, r: int = 8, p: int = 1):
+        self.n = n
+        self.r = r
+        self.p = p
+
+    def _derive(self, password: str, salt: str, n: int, r: int, p: int) -> str:
+        return hashlib.scrypt(
+            password.encode(), salt=salt.encode(), n=n, r=r, p=p,
+            maxmem=256 * n * r + 1024 * 1024, dklen=32
+        ).hex()
+
+    def encode(self, password: str, salt: str) -> str:
+        digest = self._derive(password, salt, self.n, self.r, self.p)
+        return f"{self.algorithm}${self.n}${self.r}${self.p}${salt}${digest}"
+
+    def verify(self, password: str, encoded: str, salt: str = '') -> bool:
+        try:
+            algorithm, n, r, p, salt, digest = encoded.split('$')
+            n, r, p = int(n), int(r), int(p)
+        except ValueError:
+            return False
+        if algorithm != self.algorithm:
+            return False
+        return hmac.compare_digest(self._derive(password, salt, n, r, p), digest)
+
+    def must_update(self, encoded: str) -> bool:
+        parts = encoded.split('$')
+        return len(parts) != 6 or parts[1:4] != [str(self.n), str(self.r), str(self.p)]
+
+
+PASSWORD_HASHERS = {
+    hasher.algorithm: hasher
+    for hasher in (PBKDF2SHA256Hasher, ScryptHasher, LegacySHA256Hasher)
+}
+
+
+def get_hasher(hasher: Union[str, PasswordHasher] = 'pbkdf2_sha256',
+               **params) -> PasswordHasher:
+    """
+    Build a hasher by algorithm name, or return a hasher instance as is.
+
+    Args:
+        hasher: 'pbkdf2_sha256', 'scrypt' or 'sha256', or a PasswordHasher
+        **params: Cost parameters for the hasher (iterations, or n/r/p)
+    """
+    if isinstance(hasher, PasswordHasher):
+        return hasher
+    try:
+        return PASSWORD_HASHERS[hasher](**params)
+    except KeyError:
+        raise ValueError(f"Unknown password hasher: {hasher}")
+
+
+def identify_hasher(encoded: str, preferred: Optional[PasswordHasher] = None) -> PasswordHasher:
+    """
+    Return a hasher able to verify a stored hash.
+
+    Hashes without an algorithm prefix are legacy SHA-256 digests. The
+    preferred hasher is returned when it matches, so its parameters are
+    used to decide whether the hash needs upgrading.
+    """
+    algorithm = encoded.split('$', 1)[0] if '$' in encoded else LegacySHA256Hasher.algorithm
+    if preferred is not None and preferred.algorithm == algorithm:
+        return preferred
+    return get_hasher(algorithm)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import path
 from . import views, views_csv
 
@@ -5,12 +6,18 @@ from . import views, views_csv
 # For CSV-based user management, use views_csv
 # For regular Django ORM, use views
 
+# Under ASGI (backend/asgi.py) serve login and signup with the async views
+if getattr(settings, 'USER_ASYNC_VIEWS', False):
+    login_view, go_view, signup_view = views_csv.index_async, views_csv.go_async, views_csv.signup_async
+else:
+    login_view, go_view, signup_view = views_csv.index, views_csv.go, views_csv.signup
+
 urlpatterns=[
     # CSV-based authentication (recommended for your use case)
-    path('', views_csv.index, name='index'),
+    path('', login_view, name='index'),
     path('hospital', views_csv.hospital, name='hos'),
-    path('signup', views_csv.signup, name='signup'),
-    path('login', views_csv.go, name='login'),
+    path('signup', signup_view, name='signup'),
+    path('login', go_view, name='login'),
     path('prediction', views_csv.prediction, name='prediction'),
     path('out', views_csv.out, name='out'),
     path('profile', views_csv.profile, name='profile'),
@@ -0,0 +1,38 @@
+"""
+The CSV user manager shared by every view in this process.
+
+The manager is built once from settings, so core.views, core.views_csv,
+the middleware and management commands all use the same resident table,
+locks, background workers and caches.
+"""
+
+import os
+
+from django.conf import settings
+from django.core.cache import caches
+
+from .csv_user_manager import CSVUserManager
+from .async_user_manager import AsyncCSVUserManager
+
+
+def manager_from_settings() -> CSVUserManager:
+    """Build a CSVUserManager for data/users.csv configured by the USER_* settings."""
+    cache_alias = getattr(settings, 'USER_CACHE_ALIAS', '')
+    return CSVUserManager(
+        csv_file_path=os.path.join(settings.BASE_DIR, 'data', 'users.csv'),
+        backup_dir=os.path.join(settings.BASE_DIR, 'data', 'backups'),
+        storage=getattr(settings, 'USER_STORAGE_BACKEND', 'csv'),
+        fsync=getattr(settings, 'USER_STORAGE_FSYNC', 'fsync'),
+        group_commit_window=getattr(settings, 'USER_GROUP_COMMIT_WINDOW', 0.0),
+        cache=caches[cache_alias] if cache_alias else None,
+        cache_timeout=getattr(settings, 'USER_CACHE_TIMEOUT', 300),
+        password_hasher=getattr(settings, 'USER_PASSWORD_HASHER', 'pbkdf2_sha256'),
+        auth_cache_size=getattr(settings, 'USER_AUTH_CACHE_SIZE', 0),
+        auth_cache_ttl=getattr(settings, 'USER_AUTH_CACHE_TTL', 300.0)
+    )
+
+
+csv_manager = manager_from_settings()
+
+# Awaitable front end for the async views (ASGI deployments)
+async_csv_manager = AsyncCSVUserManager(csv_manager)
@@ -0,0 +1,187 @@
+"""
+Trigram search index for the CSV User Management System.
+
+Each row's username, email and hospital name are lowercased and joined
+with a boundary marker into one string, and every three-character window
+of that string maps to a posting list of row positions. A query is
+answered by verifying only the rows in its rarest trigram's postings
+instead of scanning every user, and boundary trigrams make field-prefix
+queries as cheap as substring ones.
+
+Postings are compact ``array('I')`` lists. Updates append the trigrams a
+row gains and leave stale entries in place; every candidate is verified
+against the row's current text, so stale entries cost time, not results.
+"""
+
+import re
+from array import array
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+SEARCH_FIELDS = ('username', 'email', 'hospital_name')
+SEARCH_MODES = ('ranked', 'prefix', 'substring')
+
+# Separates fields in a row's search text; stripped from queries
+_BOUNDARY = '\x00'
+
+# Ranking tiers, best first
+TIER_EXACT = 0      # a whole field equals the query
+TIER_PREFIX = 1     # a field starts with the query
+TIER_WORD = 2       # a word inside a field starts with the query
+TIER_SUBSTRING = 3  # the query appears anywhere
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase a query and drop characters the index reserves."""
+    return query.strip().lower().replace(_BOUNDARY, '')
+
+
+def _search_text(user) -> str:
+    """Build the boundary-joined, lowercased text a row is matched against."""
+    values = (getattr(user, field, '') or '' for field in SEARCH_FIELDS)
+    return _BOUNDARY + _BOUNDARY.join(value.lower().replace(_BOUNDARY, '') for value in values) + _BOUNDARY
+
+
+def _grams(text: str) -> set:
+    """Trigrams of a search text, plus the field-start bigrams for 1-character prefixes."""
+    grams = {text[i:i + 3] for i in range(len(text) - 2)}
+    grams.update(_BOUNDARY + field[:1] for field in text.split(_BOUNDARY) if field)
+    return grams
+
+
+class UserSearchIndex:
+    """
+    Trigram postings over the search fields of a user table.
+
+    Positions are row positions in the owning table, which never change.
+    The index is not locked; the table's owner serializes writes against
+    searches.
+    """
+
+    __slots__ = ('_texts', '_postings', '_unordered')
+
+    def __init__(self, users: Iterable = ()):
+        self._texts: List[str] = []
+        self._postings: Dict[str, array] = {}
+        # Grams whose postings replace() appended to, so may be unsorted
+        self._unordered = set()
+        for position, user in enumerate(users):
+            self.add(position, user)
+
+    def _post(self, grams: Iterable[str], position: int):
+        postings = self._postings
+        for gram in grams:
+            posting = postings.get(gram)
+            if posting is None:
+                posting = postings[gram] = array('I')
+            posting.append(position)
+
+    def add(self, position: int, user):
+        """Index a row appended to the table at `position`."""
+        text = _search_text(user)
+        self._texts.append(text)
+        self._post(_grams(text), position)
+
+    def replace(self, position: int, user):
+        """Re-index a row whose record was swapped in place."""
+        text = _search_text(user)
+        previous = self._texts[position]
+        if text != previous:
+            self._texts[position] = text
+            grams = _grams(text) - _grams(previous)
+            self._post(grams, position)
+            self._unordered.update(grams)
+
+    def _candidates(self, pattern: str) -> Optional[Iterable[int]]:
+        """Return the shortest posting list every match must be in, in position order."""
+        if len(pattern) >= 3:
+            grams = {pattern[i:i + 3] for i in range(len(pattern) - 2)}
+        elif pattern.startswith(_BOUNDARY):
+            grams = {pattern}
+        else:
+            return None  # too short to use the index
+        best = None
+        for gram in grams:
+            posting = self._postings.get(gram)
+            if posting is None:
+                return ()
+            if best is None or len(posting) < len(self._postings[best]):
+                best = gram
+        if best in self._unordered:
+            # Sort once and keep it for later searches. Concurrent searches
+            # may both do this; each swaps in an equal list, and one still
+            # reading the old list is unaffected
+            self._postings[best] = array('I', sorted(set(self._postings[best])))
+            self._unordered.discard(best)
+        return self._postings[best]
+
+    def search(self, query: str, mode: str = 'ranked') -> List[Tuple[int, int]]:
+        """
+        Find rows matching a query.
+
+        'substring' matches the query anywhere in a field, 'prefix' at the
+        start of a field, and 'ranked' is substring matching with a tier
+        per match. Queries under three characters have no trigram to
+        narrow by, so substring and ranked searches scan every row's text.
+
+        Args:
+            query: Normalized query (see normalize_query)
+            mode: 'ranked', 'prefix' or 'substring'
+
+        Returns:
+            (tier, position) pairs in position order; tier is 0 unless ranked
+        """
+        pattern = _check_query(query, mode)
+        if pattern is None:
+            return []
+        candidates = self._candidates(pattern)
+        if candidates is None:
+            # Short substring query: no trigram to narrow by
+            candidates = range(len(self._texts))
+        return _match(self._texts, candidates, pattern, query, mode)
+
+
+def scan_users(users: Sequence, query: str, mode: str = 'ranked') -> List[Tuple[int, int]]:
+    """
+    Match a query against every row without an index, e.g. while one is
+    being built. Takes and returns the same as UserSearchIndex.search.
+    """
+    pattern = _check_query(query, mode)
+    if pattern is None:
+        return []
+    texts = [_search_text(user) for user in users]
+    return _match(texts, range(len(texts)), pattern, query, mode)
+
+
+def _check_query(query: str, mode: str) -> Optional[str]:
+    """Return the text a query must appear as, or None for an empty query."""
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode: {mode}")
+    if not query:
+        return None
+    return _BOUNDARY + query if mode == 'prefix' else query
+
+
+def _match(texts: Sequence[str], candidates: Iterable[int], pattern: str,
+           query: str, mode: str) -> List[Tuple[int, int]]:
+    """Verify candidate rows against their texts and rank them in ranked mode."""
+    if mode != 'ranked':
+        return [(0, position) for position in candidates if pattern in texts[position]]
+
+    exact = _BOUNDARY + query + _BOUNDARY
+    prefix = _BOUNDARY + query
+    word = re.compile(r'[\s_.@-]' + re.escape(query))
+    matches = []
+    for position in candidates:
+        text = texts[position]
+        if pattern not in text:
+            continue
+        if exact in text:
+            tier = TIER_EXACT
+        elif prefix in text:
+            tier = TIER_PREFIX
+        elif word.search(text):
+            tier = TIER_WORD
+        else:
+            tier = TIER_SUBSTRING
+        matches.append((tier, position))
+    return matches
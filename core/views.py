@@ -5,16 +5,10 @@ from django.contrib.auth import authenticate,login,logout
 from django.contrib import messages
 from django.http import HttpResponse
 from django.conf import settings
-import os
 
-# Import CSV User Manager
-from .csv_user_manager import CSVUserManager
-
-# Initialize CSV User Manager
-csv_manager = CSVUserManager(
-    csv_file_path=os.path.join(settings.BASE_DIR, 'data', 'users.csv'),
-    backup_dir=os.path.join(settings.BASE_DIR, 'data', 'backups')
-)
+# Shared CSV User Manager
+from .user_manager import csv_manager
+from .middleware import login_required
 
 def ex_data(req,data):
     return req.POST.get(data,"")
@@ -37,6 +31,7 @@ def index(request):
                 request.session['user_id'] = result['user']['id']
                 request.session['username'] = result['user']['username']
                 request.session['hospital_name'] = result['user']['hospital_name']
+                request.session['user_stamp'] = csv_manager.session_stamp(result['user']['id'], settings.SECRET_KEY)
                 request.session['is_logged_in'] = True
                 
                 messages.success(request, f'Welcome back, {username}!')
@@ -69,6 +64,7 @@ def go(request):
                 request.session['user_id'] = result['user']['id']
                 request.session['username'] = result['user']['username']
                 request.session['hospital_name'] = result['user']['hospital_name']
+                request.session['user_stamp'] = csv_manager.session_stamp(result['user']['id'], settings.SECRET_KEY)
                 request.session['is_logged_in'] = True
                 
                 messages.success(request, f'Welcome back, {username}!')
@@ -83,18 +79,12 @@ def go(request):
     else:
         return render(request,'login.html')
 
+@login_required
 def hospital(request):
-    if not request.session.get('is_logged_in'):
-        messages.error(request, 'Please login to access this page.')
-        return redirect('login')
-    
     return render(request, 'hospital.html') 
 
+@login_required
 def prediction(request):
-    if not request.session.get('is_logged_in'):
-        messages.error(request, 'Please login to access this page.')
-        return redirect('login')
-    
     return render(request,'prediction.html')    
 
 def out(request):
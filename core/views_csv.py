@@ -6,19 +6,45 @@ from django.shortcuts import render, redirect
 from django.contrib import messages
 from django.http import HttpResponse
 from django.conf import settings
-import os
-from .csv_user_manager import CSVUserManager
+from asgiref.sync import sync_to_async
+from .user_manager import csv_manager, async_csv_manager
+from .middleware import login_required
 
-# Initialize CSV User Manager
-csv_manager = CSVUserManager(
-    csv_file_path=os.path.join(settings.BASE_DIR, 'data', 'users.csv'),
-    backup_dir=os.path.join(settings.BASE_DIR, 'data', 'backups')
-)
+ADMIN_USERS_PER_PAGE = 50
 
 def ex_data(req, data):
     """Extract data from POST request."""
     return req.POST.get(data, "").strip()
 
+def start_session(request, user):
+    """Store user info in session."""
+    request.session['user_id'] = user['id']
+    request.session['username'] = user['username']
+    request.session['hospital_name'] = user['hospital_name']
+    request.session['user_stamp'] = csv_manager.session_stamp(user['id'], settings.SECRET_KEY)
+    request.session['is_logged_in'] = True
+
+def signup_data(request):
+    """Extract and check the signup form; returns None if a field is missing."""
+    hospital_name = ex_data(request, "hospital_name")
+    hospital_id = ex_data(request, "hospital_id")
+    license_id = ex_data(request, "license_id")
+    email_id = ex_data(request, "email_id")
+    
+    # Basic validation
+    if not all([hospital_name, hospital_id, license_id, email_id]):
+        return None
+    
+    # Prepare user data
+    return {
+        'username': hospital_name,
+        'email': email_id,
+        'password': license_id,
+        'hospital_name': hospital_name,
+        'hospital_id': hospital_id,
+        'license_id': license_id
+    }
+
 def index(request):
     """Login view with CSV authentication."""
     if request.method == 'POST':
@@ -34,11 +60,7 @@ def index(request):
             result = csv_manager.authenticate_user(username, password)
             
             if result['success']:
-                # Store user info in session
-                request.session['user_id'] = result['user']['id']
-                request.session['username'] = result['user']['username']
-                request.session['hospital_name'] = result['user']['hospital_name']
-                request.session['is_logged_in'] = True
+                start_session(request, result['user'])
                 
                 messages.success(request, f'Welcome back, {username}!')
                 return redirect('hos')
@@ -56,20 +78,14 @@ def go(request):
     """Alternative login view (same as index)."""
     return index(request)
 
+@login_required
 def hospital(request):
     """Hospital dashboard view."""
-    if not request.session.get('is_logged_in'):
-        messages.error(request, 'Please login to access this page.')
-        return redirect('login')
-    
     return render(request, 'hospital.html')
 
+@login_required
 def prediction(request):
     """Prediction view."""
-    if not request.session.get('is_logged_in'):
-        messages.error(request, 'Please login to access this page.')
-        return redirect('login')
-    
     return render(request, 'prediction.html')
 
 def out(request):
@@ -82,33 +98,18 @@ def out(request):
 def signup(request):
     """User registration view using CSV storage."""
     if request.method == 'POST':
-        hospital_name = ex_data(request, "hospital_name")
-        hospital_id = ex_data(request, "hospital_id")
-        license_id = ex_data(request, "license_id")
-        email_id = ex_data(request, "email_id")
-        
-        # Basic validation
-        if not all([hospital_name, hospital_id, license_id, email_id]):
+        user_data = signup_data(request)
+        if user_data is None:
             messages.error(request, 'All fields are required.')
             return render(request, 'signup.html')
         
-        # Prepare user data
-        user_data = {
-            'username': hospital_name,
-            'email': email_id,
-            'password': license_id,
-            'hospital_name': hospital_name,
-            'hospital_id': hospital_id,
-            'license_id': license_id
-        }
-        
         try:
             # Create user using CSV manager
             result = csv_manager.create_user(user_data)
             
             if result['success']:
                 messages.success(request, 
-                    f'Account created successfully! You can now login with Hospital Name: {hospital_name}')
+                    f'Account created successfully! You can now login with Hospital Name: {user_data["hospital_name"]}')
                 return redirect('login')
             else:
                 # Display validation errors
@@ -122,37 +123,82 @@ def signup(request):
     
     return render(request, 'signup.html')
 
-def profile(request):
-    """User profile view."""
-    if not request.session.get('is_logged_in'):
-        messages.error(request, 'Please login to access this page.')
-        return redirect('login')
+async def index_async(request):
+    """
+    Login view for ASGI deployments (backend/asgi.py).
     
-    user_id = request.session.get('user_id')
-    if not user_id:
-        messages.error(request, 'Session expired. Please login again.')
-        return redirect('login')
+    The CSV manager runs on a thread pool, so password checks and file I/O
+    never block the event loop; session writes go through sync_to_async
+    because database-backed sessions are synchronous.
+    """
+    if request.method == 'POST':
+        username = ex_data(request, "username")
+        password = ex_data(request, "password")
+        
+        if not username or not password:
+            messages.error(request, 'Please enter both username and password.')
+            return render(request, 'login.html')
+        
+        try:
+            result = await async_csv_manager.authenticate_user(username, password)
+            
+            if result['success']:
+                await sync_to_async(start_session)(request, result['user'])
+                
+                messages.success(request, f'Welcome back, {username}!')
+                return redirect('hos')
+            else:
+                messages.error(request, result['message'])
+                return render(request, 'login.html')
+                
+        except Exception as e:
+            messages.error(request, f'Login error: {str(e)}')
+            return render(request, 'login.html')
     
-    # Get user data
-    result = csv_manager.get_user(user_id=user_id)
+    return render(request, 'login.html')
+
+async def go_async(request):
+    """Alternative async login view (same as index_async)."""
+    return await index_async(request)
+
+async def signup_async(request):
+    """Registration view for ASGI deployments."""
+    if request.method == 'POST':
+        user_data = signup_data(request)
+        if user_data is None:
+            messages.error(request, 'All fields are required.')
+            return render(request, 'signup.html')
+        
+        try:
+            result = await async_csv_manager.create_user(user_data)
+            
+            if result['success']:
+                messages.success(request, 
+                    f'Account created successfully! You can now login with Hospital Name: {user_data["hospital_name"]}')
+                return redirect('login')
+            else:
+                # Display validation errors
+                for error in result.get('errors', []):
+                    messages.error(request, error)
+                return render(request, 'signup.html')
+                
+        except Exception as e:
+            messages.error(request, f'Error creating account: {str(e)}')
+            return render(request, 'signup.html')
     
-    if result['success']:
-        context = {'user': result['user']}
-        return render(request, 'profile.html', context)
-    else:
-        messages.error(request, 'Could not load profile.')
-        return redirect('hos')
+    return render(request, 'signup.html')
+
+@login_required
+def profile(request):
+    """User profile view."""
+    # Resolved once by CSVUserMiddleware
+    context = {'user': dict(request.csv_user)}
+    return render(request, 'profile.html', context)
 
+@login_required
 def update_profile(request):
     """Update user profile."""
-    if not request.session.get('is_logged_in'):
-        messages.error(request, 'Please login to access this page.')
-        return redirect('login')
-    
-    user_id = request.session.get('user_id')
-    if not user_id:
-        messages.error(request, 'Session expired. Please login again.')
-        return redirect('login')
+    user_id = request.csv_user['id']
     
     if request.method == 'POST':
         update_data = {}
@@ -176,6 +222,9 @@ def update_profile(request):
                 # Update session data if username changed
                 if 'hospital_name' in update_data:
                     request.session['hospital_name'] = update_data['hospital_name']
+                # A new password revokes other sessions; keep this one
+                if 'password' in update_data:
+                    request.session['user_stamp'] = csv_manager.session_stamp(user_id, settings.SECRET_KEY)
                 
                 return redirect('profile')
             else:
@@ -185,28 +234,36 @@ def update_profile(request):
     
     return redirect('profile')
 
+@login_required
 def admin_users(request):
     """Admin view to list all users (for demonstration purposes)."""
-    if not request.session.get('is_logged_in'):
-        messages.error(request, 'Please login to access this page.')
-        return redirect('login')
-    
     # In a real application, you'd check for admin privileges
-    result = csv_manager.list_users()
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+    except ValueError:
+        page = 1
     
-    if result['success']:
-        context = {'users': result['users']}
-        return render(request, 'admin_users.html', context)
-    else:
+    try:
+        # Fetch one extra row to know whether a next page exists
+        users = list(csv_manager.iter_users(
+            offset=(page - 1) * ADMIN_USERS_PER_PAGE,
+            limit=ADMIN_USERS_PER_PAGE + 1
+        ))
+    except Exception:
         messages.error(request, 'Could not load users.')
         return redirect('hos')
+    
+    context = {
+        'users': users[:ADMIN_USERS_PER_PAGE],
+        'page': page,
+        'previous_page': page - 1 if page > 1 else None,
+        'next_page': page + 1 if len(users) > ADMIN_USERS_PER_PAGE else None,
+    }
+    return render(request, 'admin_users.html', context)
 
+@login_required
 def delete_user(request, user_id):
     """Delete a user (admin function)."""
-    if not request.session.get('is_logged_in'):
-        messages.error(request, 'Please login to access this page.')
-        return redirect('login')
-    
     # In a real application, you'd check for admin privileges
     result = csv_manager.delete_user(user_id)
     
@@ -123,39 +123,32 @@ def view_csv_with_manager(csv_file_path):
 def view_csv_summary(csv_file_path):
     """View CSV file summary statistics."""
     print("\n=== CSV Summary ===")
-    try:
-        with open(csv_file_path, 'r', newline='', encoding='utf-8') as file:
-            reader = csv.DictReader(file)
-            rows = list(reader)
-            
-            if not rows:
-                print("No data found in CSV file.")
-                return
-            
-            total_users = len(rows)
-            active_users = sum(1 for row in rows if row.get('is_active') == 'true')
-            inactive_users = total_users - active_users
-            
-            print(f"Total users: {total_users}")
-            print(f"Active users: {active_users}")
-            print(f"Inactive users: {inactive_users}")
-            
-            # Get unique hospitals
-            hospitals = set(row.get('hospital_name', '') for row in rows if row.get('hospital_name'))
-            print(f"Unique hospitals: {len(hospitals)}")
-            
-            # Get creation dates
-            creation_dates = [row.get('created_at', '') for row in rows if row.get('created_at')]
-            if creation_dates:
-                print(f"Date range: {min(creation_dates)} to {max(creation_dates)}")
-            
-            print("\nHospitals:")
-            for hospital in sorted(hospitals):
-                if hospital:
-                    print(f"  - {hospital}")
-                    
-    except FileNotFoundError:
+    # Check first: the manager would create an empty users file for a missing path
+    if not os.path.exists(csv_file_path):
         print(f"CSV file not found: {csv_file_path}")
+        return
+    try:
+        # Counters maintained by the manager; no per-row scan here
+        manager = CSVUserManager(csv_file_path)
+        stats = manager.get_stats()
+        manager.close()
+        
+        if not stats['total_users']:
+            print("No data found in CSV file.")
+            return
+        
+        print(f"Total users: {stats['total_users']}")
+        print(f"Active users: {stats['active_users']}")
+        print(f"Inactive users: {stats['inactive_users']}")
+        print(f"Unique hospitals: {stats['unique_hospitals']}")
+        
+        if stats['first_created']:
+            print(f"Date range: {stats['first_created']} to {stats['last_created']}")
+        
+        print("\nHospitals:")
+        for hospital, count in stats['hospitals'].items():
+            print(f"  - {hospital} ({count})")
+                
     except Exception as e:
         print(f"Error reading CSV file: {e}")
 
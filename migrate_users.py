@@ -32,29 +32,27 @@ def migrate_users():
     print("Starting migration to CSV format...")
     print("=" * 50)
     
-    migrated_count = 0
-    skipped_count = 0
+    def user_rows():
+        for django_user in django_users.order_by('pk').iterator(chunk_size=1000):
+            # Prepare user data for CSV
+            yield {
+                'username': django_user.username,
+                'email': django_user.email if django_user.email else f"{django_user.username}@example.com",
+                'password': 'migrated_password_123',  # Default password for migrated users
+                'hospital_name': django_user.username,  # Use username as hospital name
+                'hospital_id': django_user.first_name if django_user.first_name else f"H{django_user.id:03d}",
+                'license_id': f"LIC{django_user.id:03d}"
+            }
     
-    for django_user in django_users:
-        # Prepare user data for CSV
-        user_data = {
-            'username': django_user.username,
-            'email': django_user.email if django_user.email else f"{django_user.username}@example.com",
-            'password': 'migrated_password_123',  # Default password for migrated users
-            'hospital_name': django_user.username,  # Use username as hospital name
-            'hospital_id': django_user.first_name if django_user.first_name else f"H{django_user.id:03d}",
-            'license_id': f"LIC{django_user.id:03d}"
-        }
-        
-        # Try to create user in CSV
-        result = csv_manager.create_user(user_data)
-        
-        if result['success']:
-            print(f"✅ Migrated: {django_user.username} ({django_user.email})")
-            migrated_count += 1
-        else:
-            print(f"❌ Skipped: {django_user.username} - {result.get('errors', ['Unknown error'])}")
-            skipped_count += 1
+    # Import every user in batches: one validation pass and one write per
+    # batch and a single backup, instead of a write and backup per user
+    result = csv_manager.bulk_create_users(user_rows())
+    
+    for failure in result['errors']:
+        print(f"❌ Skipped: {failure['username']} - {failure['errors']}")
+    
+    migrated_count = result['created']
+    skipped_count = result['skipped']
     
     print("=" * 50)
     print(f"Migration completed:")
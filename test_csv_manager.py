@@ -5,7 +5,13 @@ This script runs comprehensive tests to validate the functionality.
 """
 
 import sys
+import csv
+import io
 import os
+import asyncio
+import itertools
+import threading
+import time
 import tempfile
 import shutil
 from pathlib import Path
@@ -14,6 +20,9 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent / 'core'))
 
 from csv_user_manager import CSVUserManager
+from user_storage import BinaryUserStorage, CSVUserStorage, UserRecord
+from async_user_manager import AsyncCSVUserManager
+from password_hashers import PBKDF2SHA256Hasher
 
 class TestCSVUserManager:
     """Test class for CSV User Manager."""
@@ -24,16 +33,27 @@ class TestCSVUserManager:
         self.csv_file = os.path.join(self.temp_dir, 'test_users.csv')
         self.backup_dir = os.path.join(self.temp_dir, 'backups')
         
+        # Managers to close before the temporary directory is removed
+        self.managers = []
+        
         # Initialize CSV manager
-        self.csv_manager = CSVUserManager(
+        self.csv_manager = self.new_manager(
             csv_file_path=self.csv_file,
             backup_dir=self.backup_dir
         )
         
         self.test_results = []
     
+    def new_manager(self, **kwargs):
+        """Create a manager that cleanup() closes."""
+        manager = CSVUserManager(**kwargs)
+        self.managers.append(manager)
+        return manager
+    
     def cleanup(self):
         """Clean up temporary files."""
+        for manager in self.managers:
+            manager.close()
         if os.path.exists(self.temp_dir):
             shutil.rmtree(self.temp_dir)
     
@@ -102,6 +122,16 @@ class TestCSVUserManager:
             "CSV injection prevention",
             "Should prevent CSV injection"
         )
+        
+        # Test batch validation
+        batch_errors = self.csv_manager.validate_many([user_data, injection_user])
+        self.assert_test(
+            batch_errors[0] == [] and
+            "Invalid character '=' in username" in batch_errors[1] and
+            "Invalid character '\"' in password" in batch_errors[1],
+            "Batch validation",
+            "validate_many should report errors per record"
+        )
     
     def test_authentication(self):
         """Test authentication functionality."""
@@ -130,6 +160,31 @@ class TestCSVUserManager:
             "Non-existent user rejection",
             "Should reject non-existent users"
         )
+        
+        # Unknown and inactive users still pay for a password check, so
+        # response times do not reveal which usernames exist
+        class CountingHasher(PBKDF2SHA256Hasher):
+            verified = 0
+            
+            def verify(self, password, encoded, salt=''):
+                CountingHasher.verified += 1
+                return super().verify(password, encoded, salt)
+        
+        manager = self.new_manager(
+            csv_file_path=os.path.join(self.temp_dir, 'timing.csv'),
+            backup_dir=self.backup_dir,
+            password_hasher=CountingHasher(iterations=1000)
+        )
+        created = manager.create_user({'username': 'timing_user', 'email': 'timing@example.com',
+                                       'password': 'password123'})
+        manager.delete_user(created['user_id'])
+        results = [manager.authenticate_user(name, 'password123')['success']
+                   for name in ('unknown_user', 'timing_user')]
+        self.assert_test(
+            results == [False, False] and CountingHasher.verified == 2,
+            "Constant-work login rejection",
+            f"Expected a password check per rejected login, got {CountingHasher.verified}"
+        )
     
     def test_user_retrieval(self):
         """Test user retrieval functionality."""
@@ -255,6 +310,16 @@ class TestCSVUserManager:
             "Failed to list all users"
         )
         
+        # Test paged streaming with field projection
+        page = list(self.csv_manager.iter_users(offset=1, limit=1,
+                                                fields=['id', 'username', 'salt'],
+                                                active_only=False))
+        self.assert_test(
+            len(page) == 1 and set(page[0]) == {'id', 'username'},
+            "Paged user streaming",
+            "iter_users should page and never yield sensitive fields"
+        )
+        
         # Verify the lists contain the expected users
         if result['success']:
             usernames = [user['username'] for user in result['users']]
@@ -284,6 +349,9 @@ class TestCSVUserManager:
         
         self.csv_manager.create_user(user_data)
         
+        # Backups are written by a background worker
+        self.csv_manager.backups.flush(timeout=10)
+        
         # Check if backup files exist
         backup_files = os.listdir(self.backup_dir)
         self.assert_test(
@@ -291,6 +359,756 @@ class TestCSVUserManager:
             "Backup file creation",
             "Backup files should be created"
         )
+        
+        # Verify and restore the latest backup
+        self.assert_test(
+            self.csv_manager.verify_backups()['success'],
+            "Backup verification",
+            "Stored backups should match their digests"
+        )
+        entry = self.csv_manager.backups.snapshot()
+        result = self.csv_manager.restore_backup(entry['digest'])
+        self.assert_test(
+            result['success'] and self.csv_manager.get_user(username='backup_test_user')['success'],
+            "Backup restore",
+            "Restoring a snapshot should keep the backed-up users"
+        )
+        
+        # Two managers sharing a backup directory keep one retention count
+        shared_dir = os.path.join(self.temp_dir, 'shared_backups')
+        managers = [
+            self.new_manager(csv_file_path=os.path.join(self.temp_dir, f'shared_{n}.csv'),
+                             backup_dir=shared_dir, backup_keep=3)
+            for n in range(2)
+        ]
+        for n in range(4):
+            for manager in managers:
+                manager.create_user({'username': f'shared_{n}', 'email': f'shared{n}@example.com',
+                                     'password': 'password123'})
+                manager.backups.snapshot()
+        entries = managers[0].backups.list_backups()
+        objects = [name for _, _, files in os.walk(os.path.join(shared_dir, 'objects')) for name in files]
+        self.assert_test(
+            len(entries) == 3 and len(objects) == 3 and managers[1].verify_backups()['success'],
+            "Shared backup retention",
+            f"Expected 3 backups and objects, got {len(entries)} and {len(objects)}"
+        )
+        
+    def test_external_changes(self):
+        """Test that the resident table picks up writes from another manager."""
+        print("Testing external change detection...")
+        
+        other_manager = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir
+        )
+        other_manager.create_user({
+            'username': 'external_user',
+            'email': 'external@example.com',
+            'password': 'password123'
+        })
+        
+        result = self.csv_manager.get_user(username='external_user')
+        self.assert_test(
+            result['success'],
+            "External write visibility",
+            "Resident table should reload after the file changes on disk"
+        )
+        
+        # A row still being appended by another process is not read yet
+        count = self.csv_manager.count_users(active_only=False)
+        size = os.path.getsize(self.csv_file)
+        with open(self.csv_file, 'a', encoding='utf-8') as file:
+            file.write('999,partial_user,partial@exa')
+        unlocked = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir,
+            fsync='none'
+        )
+        self.assert_test(
+            self.csv_manager.count_users(active_only=False) == count and
+            unlocked.storage.atomic_reads and
+            not unlocked.get_user(username='partial_user')['success'],
+            "Partial append ignored",
+            "An unterminated, incomplete last row should not be loaded"
+        )
+        os.truncate(self.csv_file, size)
+    
+    def test_journal_compaction(self):
+        """Test journal replay and compaction of update/delete mutations."""
+        print("Testing journal compaction...")
+        
+        result = self.csv_manager.update_user('1', {'hospital_name': 'Journaled Hospital'})
+        reloaded = self.new_manager(csv_file_path=self.csv_file, backup_dir=self.backup_dir)
+        user = reloaded.get_user(user_id='1').get('user', {})
+        self.assert_test(
+            result['success'] and user.get('hospital_name') == 'Journaled Hospital',
+            "Journal replay on load",
+            "Journaled update should be visible to a freshly loaded manager"
+        )
+        
+        result = self.csv_manager.compact()
+        with open(self.csv_file, 'r', encoding='utf-8') as file:
+            snapshot = file.read()
+        self.assert_test(
+            result['success'] and 'Journaled Hospital' in snapshot and
+            os.path.getsize(self.csv_file + '.wal') == 0,
+            "Journal compaction",
+            "Compaction should fold the journal into the CSV snapshot"
+        )
+    
+    def test_storage_backends(self):
+        """Test that SQLite and binary storage honour the same contract."""
+        print("Testing storage backends...")
+        
+        for backend in ('sqlite', 'binary'):
+            manager = self.new_manager(
+                csv_file_path=self.csv_file,
+                backup_dir=self.backup_dir,
+                storage=backend
+            )
+            seeded = manager.get_user(username='test_user')['success']
+            result = manager.create_user({
+                'username': f'{backend}_user',
+                'email': f'{backend}@example.com',
+                'password': 'password123'
+            })
+            manager.update_user(result.get('user_id'), {'hospital_name': 'Backend Hospital'})
+            
+            reloaded = self.new_manager(
+                csv_file_path=self.csv_file,
+                backup_dir=self.backup_dir,
+                storage=backend
+            )
+            user = reloaded.get_user(username=f'{backend}_user').get('user', {})
+            self.assert_test(
+                seeded and result['success'] and
+                user.get('hospital_name') == 'Backend Hospital' and
+                reloaded.authenticate_user(f'{backend}_user', 'password123')['success'],
+                f"{backend} storage backend",
+                f"{backend} storage should be seeded from CSV and persist changes"
+            )
+        
+        # An in-place binary update is seen even if size and mtime are unchanged
+        path = os.path.join(self.temp_dir, 'stale_check.bin')
+        reader, writer = BinaryUserStorage(path), BinaryUserStorage(path)
+        reader.initialize()
+        writer.append(UserRecord(id='1', username='stale_user'))
+        reader.load()
+        writer.load()
+        before = os.stat(path)
+        writer.update(UserRecord(id='1', username='stale_user', hospital_name='Changed'),
+                      {'hospital_name': 'Changed'})
+        os.utime(path, ns=(before.st_atime_ns, before.st_mtime_ns))
+        self.assert_test(
+            reader.is_stale() and reader.load()[0].hospital_name == 'Changed' and
+            not reader.is_stale(),
+            "Binary storage change detection",
+            "Another process's in-place update should make the table stale"
+        )
+        
+        # Every backend rejects taking another user's email the same way
+        for backend in ('csv', 'sqlite', 'binary'):
+            manager = self.new_manager(
+                csv_file_path=self.csv_file,
+                backup_dir=self.backup_dir,
+                storage=backend
+            )
+            taken = manager.get_user(username='test_user')['user']['email']
+            created = manager.create_user({
+                'username': f'{backend}_email_user',
+                'email': f'{backend}.email@example.com',
+                'password': 'password123'
+            })
+            result = manager.update_user(created.get('user_id'), {'email': taken})
+            self.assert_test(
+                result == {'success': False, 'message': 'Email already exists'},
+                f"{backend} duplicate email update",
+                f"Expected a duplicate email rejection, got {result}"
+            )
+        
+    def test_user_records(self):
+        """Test the compact resident row representation."""
+        print("Testing user records...")
+        
+        record = UserRecord(id='1', username='record_user', hospital_name='Shared Hospital')
+        changed = record.replace(email='record@example.com', unknown='ignored')
+        other = UserRecord.from_dict({'id': '2', 'hospital_name': 'Shared ' + 'Hospital'})
+        
+        self.assert_test(
+            not hasattr(record, '__dict__') and
+            record.email == '' and changed.email == 'record@example.com' and
+            changed.to_dict(['id', 'email']) == {'id': '1', 'email': 'record@example.com'} and
+            other.hospital_name is record.hospital_name,
+            "Compact user records",
+            "UserRecord should be slotted, copy on replace and intern hospital names"
+        )
+    
+    def test_password_rehash(self):
+        """Test that legacy password hashes are upgraded on login."""
+        print("Testing password rehash on login...")
+        
+        legacy = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir,
+            password_hasher='sha256'
+        )
+        result = legacy.create_user({
+            'username': 'legacy_user',
+            'email': 'legacy@example.com',
+            'password': 'password123'
+        })
+        
+        manager = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir,
+            password_hasher='scrypt'
+        )
+        login = manager.authenticate_user('legacy_user', 'password123')
+        stored = manager._table.users[manager._table.username_index['legacy_user']]
+        
+        self.assert_test(
+            result['success'] and login['success'] and
+            stored.password_hash.startswith('scrypt$') and
+            not manager.authenticate_user('legacy_user', 'wrong')['success'] and
+            manager.authenticate_user('legacy_user', 'password123')['success'],
+            "Password rehash on login",
+            "Legacy SHA-256 hashes should verify and be replaced by the configured hasher"
+        )
+    
+    def test_credential_cache(self):
+        """Test the verified-credential cache and its invalidation."""
+        print("Testing credential cache...")
+        
+        manager = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir,
+            auth_cache_size=16
+        )
+        result = manager.create_user({
+            'username': 'cached_user',
+            'email': 'cached@example.com',
+            'password': 'password123'
+        })
+        user_id = result.get('user_id')
+        
+        first = manager.authenticate_user('cached_user', 'password123')['success']
+        cached = len(manager._auth_cache._entries) == 1
+        repeat = manager.authenticate_user('cached_user', 'password123')['success']
+        wrong = manager.authenticate_user('cached_user', 'wrong')['success']
+        
+        manager.update_user(user_id, {'password': 'newpassword'})
+        old_after_change = manager.authenticate_user('cached_user', 'password123')['success']
+        new_after_change = manager.authenticate_user('cached_user', 'newpassword')['success']
+        
+        manager.delete_user(user_id)
+        after_delete = manager.authenticate_user('cached_user', 'newpassword')['success']
+        
+        self.assert_test(
+            first and cached and repeat and not wrong and
+            not old_after_change and new_after_change and not after_delete,
+            "Credential cache",
+            "Cached logins should be dropped on password change and deletion"
+        )
+    
+    def test_bulk_import(self):
+        """Test batched user import."""
+        print("Testing bulk import...")
+        
+        rows = ({
+            'username': f'bulk_user_{i}',
+            'email': f'bulk{i}@example.com',
+            'password': 'password123'
+        } for i in range(12))
+        duplicates = [
+            {'username': 'bulk_user_3', 'email': 'other@example.com', 'password': 'password123'},
+            {'username': 'bulk=bad', 'email': 'bad@example.com', 'password': 'password123'},
+        ]
+        
+        result = self.csv_manager.bulk_create_users(
+            itertools.chain(rows, duplicates), batch_size=5
+        )
+        reloaded = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir
+        )
+        
+        self.assert_test(
+            result['success'] and result['created'] == 12 and result['skipped'] == 2 and
+            [failure['index'] for failure in result['errors']] == [12, 13] and
+            reloaded.authenticate_user('bulk_user_11', 'password123')['success'],
+            "Bulk import",
+            "bulk_create_users should import valid rows and report duplicates and invalid rows"
+        )
+        
+        # A row the storage cannot hold is skipped; the rest of its batch imports
+        manager = self.new_manager(
+            csv_file_path=os.path.join(self.temp_dir, 'bulk_binary.csv'),
+            backup_dir=self.backup_dir,
+            storage='binary'
+        )
+        result = manager.bulk_create_users(({
+            'username': 'u' * 70 if i == 2 else f'binary_bulk_{i}',
+            'email': f'binary.bulk{i}@example.com',
+            'password_hash': 'x'
+        } for i in range(6)), batch_size=4)
+        self.assert_test(
+            result['success'] and result['created'] == 5 and
+            [failure['index'] for failure in result['errors']] == [2] and
+            manager.count_users() == 5,
+            "Bulk import storage check",
+            f"Only the over-long row should be skipped, got {result}"
+        )
+        
+        # An exported users.csv imports with its hashes, as import_users reads it
+        entry = self.csv_manager.backups.snapshot()
+        exported = self.csv_manager.backups.read_backup(entry['digest']).decode('utf-8')
+        rows = list(csv.DictReader(io.StringIO(exported)))
+        imported = self.new_manager(
+            csv_file_path=os.path.join(self.temp_dir, 'imported.csv'),
+            backup_dir=os.path.join(self.temp_dir, 'imported_backups')
+        )
+        result = imported.bulk_create_users(csv.DictReader(io.StringIO(exported)))
+        inactive = [row['username'] for row in rows if row['is_active'] == 'false']
+        self.assert_test(
+            result['success'] and result['created'] == len(rows) and not result['errors'] and
+            imported.authenticate_user('bulk_user_11', 'password123')['success'] and
+            all(imported.get_user(username=name)['user']['is_active'] == 'false' for name in inactive),
+            "Exported CSV round trip",
+            f"Re-importing an exported users.csv should keep every user, got {result}"
+        )
+        
+    def test_group_commit(self):
+        """Test that concurrent writes are committed together with their own results."""
+        print("Testing group commit...")
+        
+        manager = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir,
+            password_hasher='sha256',
+            group_commit_window=0.005
+        )
+        results = {}
+        
+        def signup(index):
+            results[index] = manager.create_user({
+                'username': f'group_user_{index % 15}',
+                'email': f'group{index}@example.com',
+                'password': 'password123'
+            })
+        
+        threads = [threading.Thread(target=signup, args=(i,)) for i in range(20)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        created = [r for r in results.values() if r['success']]
+        reloaded = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir
+        )
+        self.assert_test(
+            len(created) == 15 and
+            len({r['user_id'] for r in created}) == 15 and
+            all(r['errors'] == ['Username already exists']
+                for r in results.values() if not r['success']) and
+            all(reloaded.get_user(user_id=r['user_id'])['success'] for r in created),
+            "Group commit",
+            "Concurrent signups should each get their own result and all be persisted"
+        )
+        
+        class RejectingStorage(CSVUserStorage):
+            """CSV storage that fails any write containing a 'rejected' user."""
+            
+            def append_many(self, users):
+                if any(user.username.startswith('rejected') for user in users):
+                    raise OSError('write rejected')
+                super().append_many(users)
+        
+        # A write the storage rejects fails alone, whether the backend
+        # reports it up front (binary field widths) or only on flush
+        for backend, storage in (('binary', 'binary'),
+                                 ('flush', RejectingStorage(os.path.join(self.temp_dir, 'rejecting.csv')))):
+            manager = self.new_manager(
+                csv_file_path=os.path.join(self.temp_dir, f'isolated_{backend}.csv'),
+                backup_dir=self.backup_dir,
+                storage=storage,
+                password_hasher='sha256',
+                group_commit_window=0.05
+            )
+            results = {}
+            
+            def signup(index):
+                results[index] = manager.create_user({
+                    'username': f'rejected_{index}' if index == 2 else f'isolated_{index}',
+                    'email': f'isolated{index}@example.com',
+                    'password': 'password123',
+                    'hospital_name': 'H' * 200 if index == 2 else 'Hospital'
+                })
+            
+            threads = [threading.Thread(target=signup, args=(i,)) for i in range(5)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            
+            self.assert_test(
+                [index for index in sorted(results) if not results[index]['success']] == [2] and
+                manager.count_users() == 4,
+                f"Group commit isolation ({backend})",
+                f"Only the rejected signup should fail, got {results}"
+            )
+    
+    def test_async_manager(self):
+        """Test the asyncio front end and read coalescing."""
+        print("Testing async manager...")
+        
+        async_manager = AsyncCSVUserManager(self.csv_manager)
+        calls = []
+        get_user = self.csv_manager.get_user
+        
+        def slow_get_user(*args):
+            calls.append(args)
+            time.sleep(0.05)
+            return get_user(*args)
+        
+        async def scenario():
+            created = await async_manager.create_user({
+                'username': 'async_user',
+                'email': 'async@example.com',
+                'password': 'password123'
+            })
+            self.csv_manager.get_user = slow_get_user
+            try:
+                lookups = await asyncio.gather(
+                    *[async_manager.get_user(username='async_user') for _ in range(10)]
+                )
+            finally:
+                del self.csv_manager.get_user
+            login = await async_manager.authenticate_user('async_user', 'password123')
+            return created, lookups, login
+        
+        created, lookups, login = asyncio.run(scenario())
+        self.assert_test(
+            created['success'] and login['success'] and len(calls) == 1 and
+            all(r['user']['username'] == 'async_user' for r in lookups) and
+            lookups[0] is not lookups[1],
+            "Async manager",
+            "Concurrent identical reads should share one call and return separate results"
+        )
+    
+    def test_user_cache(self):
+        """Test read-through caching of user lookups and its invalidation."""
+        print("Testing user lookup cache...")
+        
+        class DictCache:
+            """Minimal stand-in for a Django cache backend."""
+            def __init__(self):
+                self.data = {}
+            def get(self, key, default=None):
+                return self.data.get(key, default)
+            def set(self, key, value, timeout=None):
+                self.data[key] = dict(value)
+            def delete_many(self, keys):
+                for key in keys:
+                    self.data.pop(key, None)
+            def add(self, key, value, timeout=None):
+                self.data.setdefault(key, value)
+            def incr(self, key):
+                if key not in self.data:
+                    raise ValueError(key)
+                self.data[key] += 1
+        
+        manager = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir,
+            password_hasher='sha256',
+            cache=DictCache()
+        )
+        user_id = manager.create_user({
+            'username': 'cached lookup',
+            'email': 'lookup@example.com',
+            'password': 'password123'
+        })['user_id']
+        
+        manager.get_user(user_id=user_id)
+        cached = manager.get_user(user_id=user_id)
+        manager.update_user(user_id, {'hospital_name': 'Updated Hospital'})
+        updated = manager.get_user(user_id=user_id)
+        by_name = manager.get_user(username='cached lookup')
+        stats = manager.cache_stats()
+        
+        self.assert_test(
+            cached['success'] and 'password_hash' not in cached['user'] and
+            updated['user']['hospital_name'] == 'Updated Hospital' and
+            by_name['user']['id'] == user_id and
+            stats['hits'] == 1 and stats['misses'] == 3,
+            "User lookup cache",
+            "get_user should be served from the cache until a write invalidates it"
+        )
+        
+        # A restore in one process retires users another process cached
+        entry = manager.backups.snapshot()
+        other = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir,
+            cache=manager.cache
+        )
+        other.get_user(user_id=user_id)
+        manager.update_user(user_id, {'hospital_name': 'After Snapshot'})
+        other.get_user(user_id=user_id)
+        manager.restore_backup(entry['digest'])
+        restored = other.get_user(user_id=user_id)
+        self.assert_test(
+            restored['user']['hospital_name'] == 'Updated Hospital',
+            "Cache generation shared across managers",
+            f"Restore should invalidate every manager's cached users, got {restored['user']}"
+        )
+    
+    def test_session_stamp(self):
+        """Test that session stamps change on password change and deletion."""
+        print("Testing session stamps...")
+        
+        manager = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir,
+            password_hasher='sha256'
+        )
+        user_id = manager.create_user({
+            'username': 'session user',
+            'email': 'session@example.com',
+            'password': 'password123'
+        })['user_id']
+        
+        stamp = manager.session_stamp(user_id, 'secret')
+        same = manager.session_stamp(user_id, 'secret')
+        session_user = manager.session_user(user_id, stamp, 'secret')
+        forged = manager.session_user(user_id, '0' * len(stamp), 'secret')
+        other_key = manager.session_stamp(user_id, 'other secret')
+        manager.update_user(user_id, {'hospital_name': 'Session Hospital'})
+        after_profile = manager.session_stamp(user_id, 'secret')
+        manager.update_user(user_id, {'password': 'newpassword456'})
+        after_password = manager.session_stamp(user_id, 'secret')
+        manager.delete_user(user_id)
+        
+        self.assert_test(
+            stamp and stamp == same == after_profile and stamp != other_key and
+            after_password and after_password != stamp and
+            manager.session_stamp(user_id, 'secret') is None and
+            manager.session_stamp('missing', 'secret') is None and
+            session_user['username'] == 'session user' and
+            'password_hash' not in session_user and forged is None and
+            manager.session_user(user_id, after_password, 'secret') is None,
+            "Session stamp",
+            "Stamp should survive profile edits and change on password change or deletion"
+        )
+    
+    def test_user_search(self):
+        """Test the trigram search index against a plain scan, across writes."""
+        print("Testing user search...")
+        
+        manager = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir,
+            password_hasher='sha256'
+        )
+        manager.bulk_create_users([{
+            'username': f'search_{i}',
+            'email': f'search.{i}@clinic-{i % 3}.org',
+            'password_hash': 'x',
+            'hospital_name': f'Search Clinic {i % 3}'
+        } for i in range(30)])
+        
+        def scan(query):
+            query = query.lower()
+            return [user['id'] for user in manager.iter_users(active_only=False)
+                    if any(query in user[f].lower() for f in ('username', 'email', 'hospital_name'))]
+        
+        def found(query, **options):
+            return [user['id'] for user in manager.search_users(query, **options)['users']]
+        
+        first = manager.search_users('search_1')['users'][0]
+        first_id = first['id']
+        manager.update_user(first_id, {'hospital_name': 'Renamed Infirmary'})
+        
+        queries = ('search', 'CLINIC-2', 'h_2', 'Infirmary', 'clinic 1', 's', 'zz')
+        page = manager.search_users('clinic', limit=5, offset=5, mode='substring')
+        
+        # A write by another manager forces a reload, which drops the index;
+        # searches scan until it is rebuilt in the background
+        other = self.new_manager(csv_file_path=self.csv_file, backup_dir=self.backup_dir)
+        other.update_user(first_id, {'hospital_id': 'RELOAD1'})
+        scanned = [found(q) for q in queries]
+        manager.flush(timeout=10)
+        
+        self.assert_test(
+            first['username'] == 'search_1' and 'password_hash' not in first and
+            all(sorted(found(q, mode='substring')) == sorted(scan(q)) for q in queries) and
+            found('renamed', mode='prefix') == [first_id] and
+            found('clinic 1', mode='prefix') == [] and
+            found('infirmary') == [first_id] and
+            all(sorted(found(q)) == sorted(scan(q)) for q in ('h_', '_1', 's')) and
+            [found(q) for q in queries] == scanned and
+            page['total'] == len(scan('clinic')) and len(page['users']) == 5 and
+            not manager.search_users('x', mode='fuzzy')['success'],
+            "User search",
+            "Indexed search should match a plain scan, rank exact matches first and follow updates"
+        )
+    
+    def test_data_version(self):
+        """Test that the data version changes on local and external writes only."""
+        print("Testing data version...")
+        
+        manager = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir,
+            password_hasher='sha256'
+        )
+        other = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir,
+            password_hasher='sha256'
+        )
+        before = manager.data_version()
+        unchanged = manager.data_version()
+        user_id = manager.create_user({
+            'username': 'versioned user',
+            'email': 'versioned@example.com',
+            'password': 'password123'
+        })['user_id']
+        after_create = manager.data_version()
+        other.update_user(user_id, {'hospital_name': 'Elsewhere'})
+        after_external = manager.data_version()
+        
+        self.assert_test(
+            before == unchanged and len({before, after_create, after_external}) == 3,
+            "Data version",
+            "data_version should be stable while idle and change after any write"
+        )
+    
+    def test_change_listeners(self):
+        """Test row-level change events and their removal."""
+        print("Testing change listeners...")
+        
+        manager = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir,
+            password_hasher='sha256'
+        )
+        other = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir,
+            password_hasher='sha256'
+        )
+        manager.count_users()
+        events = []
+        manager.add_listener(events.extend)
+        
+        user_id = manager.create_user({
+            'username': 'listened user',
+            'email': 'listened@example.com',
+            'password': 'password123'
+        })['user_id']
+        manager.update_user(user_id, {'hospital_name': 'Listened Hospital'})
+        manager.delete_user(user_id)
+        other.create_user({
+            'username': 'unlistened user',
+            'email': 'unlistened@example.com',
+            'password': 'password123'
+        })
+        version = manager.data_version()
+        seen = len(events)
+        manager.remove_listener(events.extend)
+        manager.update_user(user_id, {'hospital_name': 'Unheard'})
+        
+        self.assert_test(
+            [event['type'] for event in events] == ['created', 'updated', 'deactivated', 'reloaded'] and
+            events[1]['user']['hospital_name'] == 'Listened Hospital' and
+            'password_hash' not in events[0]['user'] and
+            events[3]['version'] == version and
+            len(events) == seen,
+            "Change listeners",
+            "Writes should emit created/updated/deactivated, external writes 'reloaded'"
+        )
+    
+    def test_csv_export(self):
+        """Test streamed CSV export without sensitive columns."""
+        print("Testing CSV export...")
+        
+        manager = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir,
+            password_hasher='sha256'
+        )
+        chunks = list(manager.iter_csv(chunk_size=256))
+        text = ''.join(chunks)
+        rows = text.splitlines()
+        narrow = ''.join(manager.iter_csv(['id', 'email', 'salt'])).splitlines()
+        
+        self.assert_test(
+            len(chunks) > 1 and
+            rows[0].split(',') == [f for f in manager.headers if f not in ('password_hash', 'salt')] and
+            len(rows) == manager.count_users(active_only=False) + 1 and
+            narrow[0] == 'id,email' and len(narrow) == len(rows),
+            "CSV export",
+            "iter_csv should stream every user in chunks and never export hashes or salts"
+        )
+        
+        # Requested fields are limited to user columns
+        odd = ['id', '__class__', 'as_row']
+        listed = next(manager.iter_users(fields=odd, active_only=False))
+        found = manager.search_users('test', fields=odd)['users'][0]
+        self.assert_test(
+            list(listed) == ['id'] and list(found) == ['id'],
+            "Field filtering",
+            f"Only user columns should be returned, got {listed} and {found}"
+        )
+    
+    def test_user_stats(self):
+        """Test that incrementally maintained statistics match a full scan."""
+        print("Testing user statistics...")
+        
+        manager = self.new_manager(
+            csv_file_path=self.csv_file,
+            backup_dir=self.backup_dir,
+            password_hasher='sha256'
+        )
+        user_id = manager.create_user({
+            'username': 'stats user',
+            'email': 'stats@example.com',
+            'password': 'password123',
+            'hospital_name': 'Stats Hospital'
+        })['user_id']
+        manager.update_user(user_id, {'hospital_name': 'Counted Hospital'})
+        manager.delete_user(user_id)
+        
+        def scan():
+            users = list(manager.iter_users(active_only=False))
+            hospitals = {}
+            for user in users:
+                if user['hospital_name']:
+                    hospitals[user['hospital_name']] = hospitals.get(user['hospital_name'], 0) + 1
+            created = [user['created_at'] for user in users if user['created_at']]
+            return {
+                'total_users': len(users),
+                'active_users': sum(1 for user in users if user['is_active'] == 'true'),
+                'hospitals': hospitals,
+                'first_created': min(created),
+                'last_created': max(created),
+            }
+        
+        stats = manager.get_stats()
+        expected = scan()
+        
+        self.assert_test(
+            all(stats[key] == value for key, value in expected.items()) and
+            stats['inactive_users'] == stats['total_users'] - stats['active_users'] and
+            'Stats Hospital' not in stats['hospitals'] and
+            manager.count_users() == stats['active_users'],
+            "User statistics",
+            "get_stats counters should match a full scan after creates, updates and deletes"
+        )
     
     def test_file_permissions(self):
         """Test file permissions."""
@@ -332,6 +1150,22 @@ class TestCSVUserManager:
             self.test_user_deletion()
             self.test_user_listing()
             self.test_backup_creation()
+            self.test_external_changes()
+            self.test_journal_compaction()
+            self.test_storage_backends()
+            self.test_user_records()
+            self.test_password_rehash()
+            self.test_credential_cache()
+            self.test_bulk_import()
+            self.test_group_commit()
+            self.test_async_manager()
+            self.test_user_cache()
+            self.test_session_stamp()
+            self.test_user_search()
+            self.test_data_version()
+            self.test_change_listeners()
+            self.test_csv_export()
+            self.test_user_stats()
             self.test_file_permissions()
             
             print("\n=== Test Results ===")
@@ -4,17 +4,25 @@ Web-based CSV Database Viewer
 A simple Flask app to view your CSV database in a web browser.
 """
 
-from flask import Flask, render_template_string, request, jsonify
+from flask import Flask, Response, render_template_string, request, jsonify, make_response
 import csv
+import functools
+import html
+import itertools
+import json
 import os
+import queue
 import sys
+import threading
+import zlib
 from pathlib import Path
 
 # Add the core directory to the Python path
 sys.path.append(str(Path(__file__).parent / 'core'))
 
 try:
-    from csv_user_manager import CSVUserManager
+    from csv_user_manager import CSVUserManager, SENSITIVE_FIELDS
+    from user_search import SEARCH_MODES
 except ImportError:
     print("csv_user_manager.py not found. Make sure it's in the core directory.")
     sys.exit(1)
@@ -24,10 +32,73 @@ app = Flask(__name__)
 # Configuration
 CSV_FILE_PATH = 'users.csv'
 BACKUP_DIR = 'backups'
+EVENTS_HEARTBEAT = 15  # seconds between keep-alives and external-change checks
+EVENTS_QUEUE_SIZE = 1000  # per client; a client that falls further behind reloads
 
 # Initialize CSV manager
 csv_manager = CSVUserManager(CSV_FILE_PATH, BACKUP_DIR)
 
+def conditional(view):
+    """
+    Serve a view with an ETag from the manager's data version and answer
+    If-None-Match with 304 while the data is unchanged, without running
+    the view or reading the CSV file.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        version = csv_manager.data_version()
+        if request.if_none_match.contains_weak(version):
+            response = make_response('', 304)
+        else:
+            response = make_response(view(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+        # Weak: gzip and identity encodings of the same data share it
+        response.set_etag(version, weak=True)
+        # Let browsers keep the copy but revalidate it on every load
+        response.headers['Cache-Control'] = 'no-cache'
+        return response
+    return wrapper
+
+def export_fields():
+    """
+    Read the ?fields= column list for an export.
+    
+    Returns:
+        (fields or None for the default columns, error message or None)
+    """
+    fields = request.args.get('fields')
+    if not fields:
+        return None, None
+    fields = [field for field in fields.split(',') if field]
+    rejected = [field for field in fields
+                if field not in csv_manager.headers or field in SENSITIVE_FIELDS]
+    if rejected:
+        return None, f"Unknown or restricted fields: {', '.join(rejected)}"
+    return fields or None, None
+
+def streamed(chunks, mimetype, headers=None):
+    """
+    Stream text chunks as a response, gzip-compressed on the fly when the
+    client accepts it, so memory stays flat for any size of export.
+    """
+    headers = dict(headers or {}, Vary='Accept-Encoding')
+    if 'gzip' in request.accept_encodings:
+        headers['Content-Encoding'] = 'gzip'
+        body = gzip_chunks(chunks)
+    else:
+        body = (chunk.encode('utf-8') for chunk in chunks)
+    return Response(body, mimetype=mimetype, headers=headers)
+
+def gzip_chunks(chunks):
+    """Compress text chunks into one gzip stream."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
 # HTML Template
 HTML_TEMPLATE = '''
 <!DOCTYPE html>
@@ -198,19 +269,19 @@ HTML_TEMPLATE = '''
         
         <div class="stats">
             <div class="stat-item">
-                <div class="stat-number">{{ total_users }}</div>
+                <div class="stat-number" id="totalUsers">{{ total_users }}</div>
                 <div class="stat-label">Total Users</div>
             </div>
             <div class="stat-item">
-                <div class="stat-number">{{ active_users }}</div>
+                <div class="stat-number" id="activeUsers">{{ active_users }}</div>
                 <div class="stat-label">Active Users</div>
             </div>
             <div class="stat-item">
-                <div class="stat-number">{{ inactive_users }}</div>
+                <div class="stat-number" id="inactiveUsers">{{ inactive_users }}</div>
                 <div class="stat-label">Inactive Users</div>
             </div>
             <div class="stat-item">
-                <div class="stat-number">{{ unique_hospitals }}</div>
+                <div class="stat-number" id="uniqueHospitals">{{ unique_hospitals }}</div>
                 <div class="stat-label">Hospitals</div>
             </div>
         </div>
@@ -243,7 +314,7 @@ HTML_TEMPLATE = '''
                 </thead>
                 <tbody>
                     {% for user in users %}
-                    <tr>
+                    <tr data-user-id="{{ user.id }}">
                         <td>{{ user.id }}</td>
                         <td>{{ user.username }}</td>
                         <td>{{ user.email }}</td>
@@ -296,31 +367,86 @@ HTML_TEMPLATE = '''
             }
         }
         
-        // Auto-refresh every 30 seconds
-        setInterval(function() {
-            location.reload();
-        }, 30000);
+        function setCells(row, user) {
+            var values = [
+                user.id, user.username, user.email, user.hospital_name,
+                user.hospital_id, user.license_id,
+                (user.created_at || '').substring(0, 10),
+                (user.updated_at || '').substring(0, 10)
+            ];
+            while (row.cells.length < values.length + 1) {
+                row.insertCell(-1);
+            }
+            for (var i = 0; i < values.length; i++) {
+                row.cells[i].textContent = values[i];
+            }
+            var status = document.createElement('span');
+            status.className = user.is_active === 'true' ? 'status-active' : 'status-inactive';
+            status.textContent = user.is_active === 'true' ? 'Active' : 'Inactive';
+            row.cells[values.length].replaceChildren(status);
+        }
+        
+        function updateStats(event) {
+            var stats = JSON.parse(event.data);
+            document.getElementById('totalUsers').textContent = stats.total_users;
+            document.getElementById('activeUsers').textContent = stats.active_users;
+            document.getElementById('inactiveUsers').textContent = stats.inactive_users;
+            document.getElementById('uniqueHospitals').textContent = stats.unique_hospitals;
+        }
+        
+        function applyChange(event) {
+            var table = document.getElementById('usersTable');
+            var change = JSON.parse(event.data);
+            if (!table) {
+                location.reload();  // first user: render the table
+                return;
+            }
+            var row = table.querySelector('tr[data-user-id="' + CSS.escape(change.user.id) + '"]');
+            if (!row) {
+                row = table.tBodies[0].insertRow(-1);
+                row.setAttribute('data-user-id', change.user.id);
+            }
+            setCells(row, change.user);
+            searchUsers();
+        }
+        
+        // Patch the table in place from the change feed; fall back to
+        // reloading every 30 seconds where EventSource is unavailable
+        if (window.EventSource) {
+            var events = new EventSource('/events?since=' + encodeURIComponent('{{ data_version }}'));
+            ['created', 'updated', 'deactivated'].forEach(function(type) {
+                events.addEventListener(type, applyChange);
+            });
+            events.addEventListener('stats', updateStats);
+            events.addEventListener('reloaded', function() {
+                location.reload();
+            });
+        } else {
+            setInterval(function() {
+                location.reload();
+            }, 30000);
+        }
     </script>
 </body>
 </html>
 '''
 
 @app.route('/')
+@conditional
 def index():
     """Main dashboard showing all users."""
     try:
+        # Statistics (and their version) first, so a write racing the
+        # render is reported by /events
+        stats = csv_manager.get_stats()
+        data_version = stats['version']
+        
         # Get all users
         result = csv_manager.list_users(active_only=False)
         
         if result['success']:
             users = result['users']
             
-            # Calculate statistics
-            total_users = len(users)
-            active_users = sum(1 for user in users if user['is_active'] == 'true')
-            inactive_users = total_users - active_users
-            unique_hospitals = len(set(user['hospital_name'] for user in users if user['hospital_name']))
-            
             # File information
             file_size = "N/A"
             last_updated = "N/A"
@@ -335,13 +461,14 @@ def index():
             
             return render_template_string(HTML_TEMPLATE,
                                         users=users,
-                                        total_users=total_users,
-                                        active_users=active_users,
-                                        inactive_users=inactive_users,
-                                        unique_hospitals=unique_hospitals,
+                                        total_users=stats['total_users'],
+                                        active_users=stats['active_users'],
+                                        inactive_users=stats['inactive_users'],
+                                        unique_hospitals=stats['unique_hospitals'],
                                         csv_file_path=CSV_FILE_PATH,
                                         file_size=file_size,
-                                        last_updated=last_updated)
+                                        last_updated=last_updated,
+                                        data_version=data_version)
         else:
             return render_template_string(HTML_TEMPLATE,
                                         users=[],
@@ -351,24 +478,83 @@ def index():
                                         unique_hospitals=0,
                                         csv_file_path=CSV_FILE_PATH,
                                         file_size="N/A",
-                                        last_updated="N/A")
+                                        last_updated="N/A",
+                                        data_version=data_version)
     except Exception as e:
         return f"Error: {str(e)}", 500
 
+@app.route('/events')
+def events():
+    """Server-sent events stream of user changes for the dashboard."""
+    changes = queue.Queue(maxsize=EVENTS_QUEUE_SIZE)
+    overflowed = threading.Event()
+    # Read now: the stream runs after the request context is gone. The
+    # page passes the version it rendered; reconnects send the last event's
+    last_seen = request.headers.get('Last-Event-ID') or request.args.get('since')
+    
+    def listener(batch):
+        # Runs on the writer's thread: only enqueue
+        try:
+            changes.put_nowait(batch)
+        except queue.Full:
+            overflowed.set()
+    
+    def format_event(event):
+        return (f"id: {event['version']}\n"
+                f"event: {event['type']}\n"
+                f"data: {json.dumps(event.get('user', {}))}\n\n")
+    
+    def stream():
+        csv_manager.add_listener(listener)
+        try:
+            # A client that missed changes starts over
+            if last_seen and last_seen != csv_manager.data_version():
+                yield format_event({'type': 'reloaded', 'version': csv_manager.data_version()})
+            while True:
+                try:
+                    batch = changes.get(timeout=EVENTS_HEARTBEAT)
+                except queue.Empty:
+                    # Reloads (and reports) the table if another process wrote
+                    csv_manager.data_version()
+                    yield ": keep-alive\n\n"
+                    continue
+                if overflowed.is_set():
+                    # Events were dropped while the queue was full
+                    overflowed.clear()
+                    with changes.mutex:
+                        changes.queue.clear()
+                    yield format_event({'type': 'reloaded', 'version': csv_manager.data_version()})
+                    continue
+                for event in batch:
+                    yield format_event(event)
+                # Fresh counters for the dashboard, read outside the listener
+                stats = csv_manager.get_stats()
+                yield (f"id: {stats['version']}\n"
+                       f"event: stats\n"
+                       f"data: {json.dumps(stats)}\n\n")
+        finally:
+            csv_manager.remove_listener(listener)
+    
+    return Response(stream(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/raw')
+@conditional
 def raw_csv():
-    """View raw CSV content."""
-    try:
-        if os.path.exists(CSV_FILE_PATH):
-            with open(CSV_FILE_PATH, 'r', newline='', encoding='utf-8') as file:
-                content = file.read()
-                return f"<pre>{content}</pre>", 200, {'Content-Type': 'text/html'}
-        else:
-            return "CSV file not found", 404
-    except Exception as e:
-        return f"Error reading CSV file: {str(e)}", 500
+    """View the user table as CSV text, escaped, streamed; ?fields=a,b selects columns."""
+    fields, error = export_fields()
+    if error:
+        return error, 400
+    
+    chunks = itertools.chain(
+        ['<pre>'],
+        (html.escape(chunk) for chunk in csv_manager.iter_csv(fields)),
+        ['</pre>']
+    )
+    return streamed(chunks, 'text/html')
 
 @app.route('/json')
+@conditional
 def json_data():
     """View data as JSON."""
     try:
@@ -381,40 +567,47 @@ def json_data():
         return jsonify({"error": str(e)}), 500
 
 @app.route('/export')
+@conditional
 def export_data():
-    """Export data as downloadable CSV."""
-    try:
-        if os.path.exists(CSV_FILE_PATH):
-            with open(CSV_FILE_PATH, 'r', newline='', encoding='utf-8') as file:
-                content = file.read()
-                
-                from flask import Response
-                return Response(
-                    content,
-                    mimetype='text/csv',
-                    headers={'Content-Disposition': f'attachment; filename=users_export.csv'}
-                )
-        else:
-            return "CSV file not found", 404
-    except Exception as e:
-        return f"Error exporting CSV file: {str(e)}", 500
+    """Export data as downloadable CSV, streamed; ?fields=a,b selects columns."""
+    fields, error = export_fields()
+    if error:
+        return error, 400
+    
+    return streamed(csv_manager.iter_csv(fields), 'text/csv',
+                    {'Content-Disposition': 'attachment; filename=users_export.csv'})
 
 @app.route('/api/users')
+@conditional
 def api_users():
-    """API endpoint to get users data."""
+    """API endpoint to get users data, paged with ?offset=&limit=&fields=."""
     try:
-        result = csv_manager.list_users(active_only=False)
-        if result['success']:
-            return jsonify({
-                'success': True,
-                'users': result['users'],
-                'total': len(result['users'])
-            })
-        else:
-            return jsonify({
-                'success': False,
-                'message': result['message']
-            }), 500
+        offset = max(request.args.get('offset', 0, type=int), 0)
+        limit = request.args.get('limit', type=int)
+        fields = request.args.get('fields')
+        fields = [field for field in fields.split(',') if field] if fields else None
+        
+        users = list(csv_manager.iter_users(offset=offset, limit=limit,
+                                            fields=fields, active_only=False))
+        return jsonify({
+            'success': True,
+            'users': users,
+            'total': csv_manager.count_users(active_only=False),
+            'offset': offset,
+            'limit': limit
+        })
+    except Exception as e:
+        return jsonify({
+            'success': False,
+            'message': str(e)
+        }), 500
+
+@app.route('/api/stats')
+@conditional
+def api_stats():
+    """API endpoint for dashboard statistics, maintained by the manager."""
+    try:
+        return jsonify(dict(csv_manager.get_stats(), success=True))
     except Exception as e:
         return jsonify({
             'success': False,
@@ -422,28 +615,32 @@ def api_users():
         }), 500
 
 @app.route('/api/search')
+@conditional
 def api_search():
-    """API endpoint to search users."""
-    query = request.args.get('q', '').lower()
+    """API endpoint to search users, ranked and paged with ?q=&mode=&offset=&limit=."""
+    query = request.args.get('q', '').strip()
     
     if not query:
         return jsonify({'success': False, 'message': 'No search query provided'}), 400
     
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = request.args.get('limit', type=int)
+    mode = request.args.get('mode', 'ranked')
+    if mode not in SEARCH_MODES:
+        return jsonify({'success': False,
+                        'message': f"mode must be one of: {', '.join(SEARCH_MODES)}"}), 400
+    
     try:
-        result = csv_manager.list_users(active_only=False)
+        # Served from the manager's trigram index instead of a full scan
+        result = csv_manager.search_users(query, limit=limit, offset=offset,
+                                          mode=mode, active_only=False)
         if result['success']:
-            # Filter users based on search query
-            filtered_users = []
-            for user in result['users']:
-                if (query in user.get('username', '').lower() or
-                    query in user.get('email', '').lower() or
-                    query in user.get('hospital_name', '').lower()):
-                    filtered_users.append(user)
-            
             return jsonify({
                 'success': True,
-                'users': filtered_users,
-                'total': len(filtered_users)
+                'users': result['users'],
+                'total': result['total'],
+                'offset': offset,
+                'limit': limit
             })
         else:
             return jsonify({
@@ -509,6 +706,8 @@ if __name__ == '__main__':
     print("  http://localhost:5000/json    - JSON format")
     print("  http://localhost:5000/export  - Download CSV")
     print("  http://localhost:5000/api/users - API endpoint")
+    print("  http://localhost:5000/api/stats - Dashboard statistics")
+    print("  http://localhost:5000/events  - Live change feed (SSE)")
     print("="*50)
     
     app.run(debug=True, host='0.0.0.0', port=5000)